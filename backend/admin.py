@@ -2,19 +2,34 @@
 LVS Portal - Admin Routes
 User management endpoints (Founder only)
 """
+import csv
+import io
+import json
+import shutil
+import tempfile
 from datetime import datetime
-from typing import Optional, List
+from itertools import islice
+from typing import Optional, List, Iterator, AsyncIterator, Dict, Any, Tuple
 
-from fastapi import APIRouter, HTTPException, status, Request, Depends, Query
-from pydantic import BaseModel, EmailStr
+from fastapi import APIRouter, HTTPException, status, Request, Depends, Query, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, EmailStr, ValidationError
 
 from auth import get_current_user, require_founder, get_client_ip
 from database import (
-    get_db_connection, close_connection, row_to_dict, create_user, get_user_by_email, get_user_by_id,
-    update_nda_status, log_audit, force_turso_resync
+    get_db_connection, close_connection, create_user, get_user_by_email, get_user_by_id,
+    update_nda_status, log_audit, force_turso_resync,
+    get_email_outbox_stats, requeue_dead_emails, get_users_page,
+    get_existing_emails, create_users_bulk, bump_comment_versions_for_user,
+    iter_users_for_export, iter_audit_log_for_export, iter_nda_records_for_export
+)
+from security import hash_password, hash_passwords
+from responses import json_response
+from config import (
+    PORTAL_DOMAINS, BULK_USER_CHUNK_SIZE, IMPORT_BATCH_SIZE, IMPORT_MAX_ROWS,
+    EXPORT_BATCH_SIZE, EXPORT_CHUNK_BYTES, USER_LIST_PAGE_SIZE
 )
-from security import hash_password
-from config import PORTAL_DOMAINS
 
 import os
 
@@ -62,6 +77,9 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
     bootstrap_key: str
 
+class RetryEmailsRequest(BaseModel):
+    outbox_ids: Optional[List[int]] = None  # All dead letters if omitted
+
 
 # ============================================================================
 # BOOTSTRAP - Create First Founder (No Auth Required)
@@ -295,57 +313,100 @@ async def create_new_user(
     )
 
 
-@router.get("/users", response_model=List[UserResponse])
+# UserResponse field -> users column, for projected listings
+USER_LIST_FIELDS = {
+    "id": "id",
+    "email": "email",
+    "name": "name",
+    "portal_type": "portal_type",
+    "company": "company",
+    "is_active": "is_active",
+    "has_2fa": "totp_enabled",
+    "nda_status": "nda_status",
+    "created_at": "created_at",
+    "last_login": "last_login",
+}
+
+
+def user_list_item(row: dict, fields: List[str]) -> dict:
+    """Shape a users row into the requested UserResponse fields."""
+    item = {}
+    for field in fields:
+        value = row[USER_LIST_FIELDS[field]]
+        if field in ("is_active", "has_2fa"):
+            value = bool(value)
+        elif field == "nda_status":
+            value = value or "not_required"
+        elif field == "created_at":
+            value = str(value or "")
+        elif field == "last_login":
+            value = str(value) if value else None
+        item[field] = value
+    return item
+
+
+@router.get("/users")
 async def list_users(
     request: Request,
     portal_type: Optional[str] = Query(None, description="Filter by portal type"),
+    q: Optional[str] = Query(None, max_length=100, description="Prefix search on email, name or company"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit for the full list"),
     current_user: dict = Depends(require_founder)
 ):
     """
-    List all users (Founder only).
+    List users, newest first (Founder only).
     Optional filter by portal_type: investor, customer, partner, founder
+    Without limit or cursor the response is the full list, as before. Pass
+    limit (and then cursor) to page: {users, count, has_more, next_cursor}.
     """
     client_ip = get_client_ip(request)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if fields:
+        selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected if f not in USER_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(USER_LIST_FIELDS)}"
+            )
+        # The id is always returned; it is the pagination cursor
+        if "id" not in selected:
+            selected.insert(0, "id")
+    else:
+        selected = list(USER_LIST_FIELDS)
 
-    query = """
-        SELECT id, email, name, portal_type, company, is_active,
-               totp_enabled, nda_status, created_at, last_login
-        FROM users
-        WHERE 1=1
-    """
-    params = []
+    columns = [USER_LIST_FIELDS[f] for f in selected]
+    search = q.strip() if q else None
 
-    if portal_type:
-        query += " AND portal_type = ?"
-        params.append(portal_type)
+    if limit is None and cursor is None:
+        rows = get_users_page(columns, portal_type=portal_type, search=search, limit=None)
+        log_audit(current_user["id"], "USERS_LISTED", f"Listed {len(rows)} users", client_ip)
+        return json_response([user_list_item(row, selected) for row in rows])
 
-    query += " ORDER BY created_at DESC"
+    if limit is None:
+        limit = USER_LIST_PAGE_SIZE
 
-    cursor.execute(query, tuple(params))
-    raw_rows = cursor.fetchall()
-    rows = [row_to_dict(cursor, row) for row in raw_rows]
-    close_connection(conn)
+    # One extra row tells us whether another page exists
+    rows = get_users_page(
+        columns,
+        portal_type=portal_type,
+        search=search,
+        cursor_id=cursor,
+        limit=limit + 1
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
     log_audit(current_user["id"], "USERS_LISTED", f"Listed {len(rows)} users", client_ip)
 
-    return [
-        UserResponse(
-            id=row["id"],
-            email=row["email"],
-            name=row["name"],
-            portal_type=row["portal_type"],
-            company=row["company"],
-            is_active=bool(row["is_active"]),
-            has_2fa=bool(row["totp_enabled"]),
-            nda_status=row["nda_status"] or "not_required",
-            created_at=str(row["created_at"] or ""),
-            last_login=str(row["last_login"]) if row["last_login"] else None
-        )
-        for row in rows
-    ]
+    return json_response({
+        "users": [user_list_item(row, selected) for row in rows],
+        "count": len(rows),
+        "has_more": has_more,
+        "next_cursor": rows[-1]["id"] if has_more else None
+    })
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
@@ -436,6 +497,13 @@ async def update_user(
 
     close_connection(conn)
 
+    # Comments show the author's name, company and portal type; refresh cached threads
+    if any(
+        value is not None and value != user.get(field)
+        for field, value in (("name", body.name), ("company", body.company), ("portal_type", body.portal_type))
+    ):
+        bump_comment_versions_for_user(user_id)
+
     log_audit(
         current_user["id"],
         "USER_UPDATED",
@@ -516,6 +584,66 @@ async def delete_user(
 class BulkCreateRequest(BaseModel):
     users: List[CreateUserRequest]
 
+async def create_users_batch(
+    user_reqs: List[CreateUserRequest],
+    seen: set
+) -> Tuple[List[dict], List[dict]]:
+    """Create a batch of users; returns (created, failed).
+
+    One query finds emails that are already taken, passwords are hashed in
+    parallel on the hashing pool and rows go in with chunked transactions.
+    `seen` collects lowercased emails across batches to reject duplicates.
+    """
+    created = []
+    failed = []
+
+    existing = await run_in_threadpool(get_existing_emails, [u.email for u in user_reqs])
+
+    pending = []
+    for user_req in user_reqs:
+        email = user_req.email.lower()
+        if email in existing:
+            failed.append({"email": user_req.email, "reason": "Already exists"})
+            continue
+        if email in seen:
+            failed.append({"email": user_req.email, "reason": "Duplicate in request"})
+            continue
+        seen.add(email)
+
+        # Auto-detect portal type
+        if not user_req.portal_type:
+            detected = get_portal_type_from_email(user_req.email)
+            portal_type = detected["portal_type"]
+            company = detected["company"]
+        else:
+            portal_type = user_req.portal_type
+            company = user_req.company
+
+        pending.append({
+            "email": user_req.email,
+            "password": user_req.password,
+            "name": user_req.name,
+            "portal_type": portal_type,
+            "company": company,
+            "nda_status": "pending" if portal_type in ("customer", "partner") else "not_required"
+        })
+
+    # Argon2 on the hashing pool, then chunked inserts off the event loop
+    hashes = await hash_passwords([user.pop("password") for user in pending])
+    for user, password_hash in zip(pending, hashes):
+        user["password_hash"] = password_hash
+
+    results = await run_in_threadpool(create_users_bulk, pending, BULK_USER_CHUNK_SIZE)
+
+    for user, result in zip(pending, results):
+        if "id" in result:
+            created.append({"email": user["email"], "id": result["id"], "portal_type": user["portal_type"]})
+        else:
+            failed.append({"email": user["email"], "reason": result["error"]})
+
+    return created, failed
+
+
 @router.post("/users/bulk", response_model=dict)
 async def bulk_create_users(
     request: Request,
@@ -528,43 +656,7 @@ async def bulk_create_users(
     """
     client_ip = get_client_ip(request)
 
-    created = []
-    failed = []
-
-    for user_req in body.users:
-        try:
-            # Check if exists
-            if get_user_by_email(user_req.email):
-                failed.append({"email": user_req.email, "reason": "Already exists"})
-                continue
-
-            # Auto-detect portal type
-            if not user_req.portal_type:
-                detected = get_portal_type_from_email(user_req.email)
-                portal_type = detected["portal_type"]
-                company = detected["company"]
-            else:
-                portal_type = user_req.portal_type
-                company = user_req.company
-
-            # Create user
-            user_id = create_user(
-                email=user_req.email,
-                password=user_req.password,
-                name=user_req.name,
-                portal_type=portal_type,
-                company=company
-            )
-
-            if user_id:
-                if portal_type in ("customer", "partner"):
-                    update_nda_status(user_id, "pending")
-                created.append({"email": user_req.email, "id": user_id, "portal_type": portal_type})
-            else:
-                failed.append({"email": user_req.email, "reason": "Creation failed"})
-
-        except Exception as e:
-            failed.append({"email": user_req.email, "reason": str(e)})
+    created, failed = await create_users_batch(body.users, set())
 
     log_audit(
         current_user["id"],
@@ -583,3 +675,309 @@ async def bulk_create_users(
             "failed": len(failed)
         }
     }
+
+
+IMPORT_REQUIRED_COLUMNS = {"email", "name", "password"}
+
+
+def read_import_rows(reader: csv.DictReader, limit: int) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """
+    Read up to `limit` more rows from the CSV (blocking file I/O).
+    Returns the rows read and an error message if the file turned out to be
+    unreadable (not UTF-8, malformed CSV); the rows before it are still returned.
+    """
+    rows = []
+    try:
+        for row in islice(reader, limit):
+            rows.append(row)
+    except UnicodeDecodeError:
+        return rows, "CSV must be UTF-8 encoded."
+    except csv.Error as e:
+        return rows, f"Malformed CSV: {e}"
+    return rows, None
+
+
+async def stream_user_import(
+    source: io.TextIOWrapper,
+    reader: csv.DictReader,
+    current_user: dict,
+    client_ip: str
+) -> AsyncIterator[str]:
+    """
+    Create users from CSV rows IMPORT_BATCH_SIZE at a time and report
+    progress as NDJSON: one "batch" line per batch, then a "done" line, or an
+    "error" line if the file can't be read past some point (the headers are
+    already sent by then). Only one batch of rows is held in memory at a time.
+    """
+    try:
+        seen: set = set()
+        totals = {"processed": 0, "created": 0, "failed": 0}
+        line = 1  # Header
+        error = None
+
+        while totals["processed"] < IMPORT_MAX_ROWS and error is None:
+            rows, error = await run_in_threadpool(
+                read_import_rows, reader, min(IMPORT_BATCH_SIZE, IMPORT_MAX_ROWS - totals["processed"])
+            )
+            if not rows:
+                break
+
+            user_reqs = []
+            failed = []
+            for row in rows:
+                line += 1
+                values = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+                email = values.get("email", "")
+                if not values.get("name") or not values.get("password"):
+                    failed.append({"line": line, "email": email, "reason": "Name and password are required"})
+                    continue
+                try:
+                    user_reqs.append(CreateUserRequest(
+                        email=email,
+                        password=values["password"],
+                        name=values["name"],
+                        portal_type=values.get("portal_type") or None,
+                        company=values.get("company") or None
+                    ))
+                except ValidationError:
+                    failed.append({"line": line, "email": email, "reason": "Invalid email"})
+
+            created, batch_failed = await create_users_batch(user_reqs, seen)
+            failed.extend(batch_failed)
+
+            totals["processed"] += len(rows)
+            totals["created"] += len(created)
+            totals["failed"] += len(failed)
+
+            yield json.dumps({"event": "batch", **totals, "created_users": created, "failed_users": failed}) + "\n"
+
+        if error is not None:
+            await run_in_threadpool(
+                log_audit,
+                current_user["id"],
+                "USERS_IMPORTED",
+                f"CSV import stopped after line {line}: {error} "
+                f"Created {totals['created']} users, {totals['failed']} failed",
+                client_ip
+            )
+            yield json.dumps({"event": "error", **totals, "line": line, "detail": error}) + "\n"
+            return
+
+        truncated = False
+        if totals["processed"] >= IMPORT_MAX_ROWS:
+            more, more_error = await run_in_threadpool(read_import_rows, reader, 1)
+            truncated = bool(more) or more_error is not None
+
+        await run_in_threadpool(
+            log_audit,
+            current_user["id"],
+            "USERS_IMPORTED",
+            f"CSV import: created {totals['created']} users, {totals['failed']} failed",
+            client_ip
+        )
+
+        yield json.dumps({"event": "done", **totals, "truncated": truncated}) + "\n"
+    finally:
+        source.close()
+
+
+@router.post("/users/import")
+async def import_users_csv(
+    request: Request,
+    file: UploadFile = File(..., description="CSV with email, name, password and optional portal_type, company"),
+    current_user: dict = Depends(require_founder)
+):
+    """
+    Create users from an uploaded CSV (Founder only).
+    Portal type is detected from the email domain when the column is empty.
+    Streams NDJSON progress lines as each batch is committed.
+    """
+    client_ip = get_client_ip(request)
+
+    # FastAPI closes the upload once this handler returns, so move it into a
+    # temp file the response owns; rows are then read from disk lazily
+    spool = tempfile.TemporaryFile()
+    await run_in_threadpool(shutil.copyfileobj, file.file, spool)
+    spool.seek(0)
+    text = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+
+    try:
+        header = {name.strip().lower() for name in (reader.fieldnames or []) if name}
+    except UnicodeDecodeError:
+        text.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV must be UTF-8 encoded."
+        )
+    missing = IMPORT_REQUIRED_COLUMNS - header
+    if missing:
+        text.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"CSV is missing required columns: {', '.join(sorted(missing))}"
+        )
+
+    return StreamingResponse(
+        stream_user_import(text, reader, current_user, client_ip),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-store"}
+    )
+
+
+# ============================================================================
+# DATA EXPORTS (Founder Only)
+# ============================================================================
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",  # Starlette appends the utf-8 charset
+    "ndjson": "application/x-ndjson",
+}
+
+USER_EXPORT_COLUMNS = [
+    "id", "email", "name", "portal_type", "company", "is_active",
+    "totp_enabled", "nda_status", "created_at", "last_login",
+]
+AUDIT_EXPORT_COLUMNS = [
+    "id", "timestamp", "user_id", "user_email", "action", "details", "ip_address",
+]
+NDA_EXPORT_COLUMNS = [
+    "id", "email", "name", "portal_type", "company", "is_active", "nda_status",
+    "nda_signed_date", "nda_expires_date", "nda_approved_at", "nda_approved_by", "nda_notes",
+]
+
+
+def csv_safe(value: Any) -> Any:
+    """Neutralize spreadsheet formulas (=, +, -, @) in exported text."""
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+def encode_export(rows: Iterator[Dict[str, Any]], columns: List[str], export_format: str) -> Iterator[str]:
+    """Encode rows as CSV or NDJSON, yielding ~EXPORT_CHUNK_BYTES at a time.
+
+    Only one chunk is ever held in memory, whatever the table size.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(columns)
+
+    for row in rows:
+        if export_format == "csv":
+            writer.writerow([csv_safe(row[column]) for column in columns])
+        else:
+            buffer.write(json.dumps({column: row[column] for column in columns}, default=str))
+            buffer.write("\n")
+
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(
+    rows: Iterator[Dict[str, Any]],
+    columns: List[str],
+    export_format: str,
+    name: str
+) -> StreamingResponse:
+    """Stream an export as a downloadable file."""
+    filename = f"lvs-{name}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return StreamingResponse(
+        encode_export(rows, columns, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store"
+        }
+    )
+
+
+@router.get("/export/users")
+async def export_users(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user: dict = Depends(require_founder)
+):
+    """Export all users (no credentials) as CSV or NDJSON (Founder only)."""
+    client_ip = get_client_ip(request)
+
+    log_audit(current_user["id"], "USERS_EXPORTED", f"Exported users as {format}", client_ip)
+
+    return export_response(
+        iter_users_for_export(EXPORT_BATCH_SIZE), USER_EXPORT_COLUMNS, format, "users"
+    )
+
+
+@router.get("/export/audit-log")
+async def export_audit_log(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    since: Optional[datetime] = Query(None, description="Only entries at or after this time (UTC)"),
+    until: Optional[datetime] = Query(None, description="Only entries before this time (UTC)"),
+    action: Optional[str] = Query(None, description="Only this action, e.g. LOGIN_SUCCESS"),
+    current_user: dict = Depends(require_founder)
+):
+    """Export the audit log as CSV or NDJSON, oldest first (Founder only)."""
+    client_ip = get_client_ip(request)
+
+    log_audit(
+        current_user["id"],
+        "AUDIT_LOG_EXPORTED",
+        f"Exported audit log as {format} (since={since}, until={until}, action={action})",
+        client_ip
+    )
+
+    return export_response(
+        iter_audit_log_for_export(since, until, action, EXPORT_BATCH_SIZE),
+        AUDIT_EXPORT_COLUMNS, format, "audit-log"
+    )
+
+
+@router.get("/export/nda")
+async def export_nda_records(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    portal_type: Optional[str] = Query(None, description="Filter by portal type"),
+    current_user: dict = Depends(require_founder)
+):
+    """Export every user's NDA status as CSV or NDJSON (Founder only)."""
+    client_ip = get_client_ip(request)
+
+    log_audit(current_user["id"], "NDA_RECORDS_EXPORTED", f"Exported NDA records as {format}", client_ip)
+
+    return export_response(
+        iter_nda_records_for_export([portal_type] if portal_type else None, EXPORT_BATCH_SIZE),
+        NDA_EXPORT_COLUMNS, format, "nda"
+    )
+
+
+# ============================================================================
+# EMAIL OUTBOX (Founder Only)
+# ============================================================================
+
+@router.get("/email-outbox")
+async def email_outbox_status(current_user: dict = Depends(require_founder)):
+    """Outbox counts by status and the latest dead-lettered emails."""
+    return get_email_outbox_stats()
+
+
+@router.post("/email-outbox/retry")
+async def retry_dead_emails(
+    request: Request,
+    body: Optional[RetryEmailsRequest] = None,
+    current_user: dict = Depends(require_founder)
+):
+    """Requeue dead-lettered emails for another round of delivery attempts."""
+    client_ip = get_client_ip(request)
+
+    requeued = requeue_dead_emails(body.outbox_ids if body else None)
+
+    log_audit(current_user["id"], "EMAIL_OUTBOX_RETRY", f"Requeued {requeued} dead-lettered emails", client_ip)
+
+    return {"success": True, "requeued": requeued}
@@ -0,0 +1,355 @@
+"""
+LVS Portal - Pipeline Analytics
+Weighted pipeline breakdowns and Monte Carlo revenue simulation over the
+customer pipeline CSV, using NumPy
+"""
+import csv
+import io
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+
+from auth import require_founder
+from portal_data import data_files
+from config import (
+    PIPELINE_SIMULATION_DEFAULT_TRIALS, PIPELINE_SIMULATION_MAX_TRIALS,
+    PIPELINE_SIMULATION_CHUNK_TRIALS, PIPELINE_SIMULATION_SEED,
+    PIPELINE_SIMULATION_CACHE_SIZE
+)
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+SIMULATION_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+
+# ============================================================================
+# PARSING
+# ============================================================================
+
+def parse_money(value: str) -> Optional[float]:
+    """'$15,000,000' -> 15000000.0; 'N/A' or blank -> None."""
+    cleaned = value.strip().replace("$", "").replace(",", "")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def parse_probability(value: str) -> Optional[float]:
+    """'60%' -> 0.6; 'N/A' or blank -> None."""
+    try:
+        return float(value.strip().rstrip("%")) / 100
+    except ValueError:
+        return None
+
+
+def close_period_key(label: str) -> Tuple[int, int]:
+    """Chronological sort key for Expected Close ('Q2 2026', '2027', '2028+', 'TBD')."""
+    match = re.fullmatch(r"Q([1-4])\s+(\d{4})", label)
+    if match:
+        return int(match.group(2)), int(match.group(1))
+    match = re.fullmatch(r"(\d{4})(\+?)", label)
+    if match:
+        # A bare year sorts after its quarters, "2027+" after that
+        return int(match.group(1)), 6 if match.group(2) else 5
+    return 9999, 0
+
+
+class PipelineArrays:
+    """The pipeline CSV as parallel NumPy arrays, one element per deal."""
+
+    def __init__(self, rows: List[Dict[str, str]]):
+        deals = []
+        self.excluded: List[str] = []
+        for row in rows:
+            total = parse_money(row.get("Total Value", ""))
+            probability = parse_probability(row.get("Probability", ""))
+            if total is None or probability is None:
+                # e.g. strategic partners with no revenue expectation
+                self.excluded.append(row.get("Company Name", ""))
+                continue
+            deals.append((
+                row.get("Company Name", ""),
+                row.get("Tier", "").strip() or "Unknown",
+                row.get("Stage", "").strip() or "Unknown",
+                row.get("Expected Close", "").strip() or "TBD",
+                total,
+                parse_money(row.get("Near-Term Value", "")) or 0.0,
+                probability,
+            ))
+
+        self.names = np.array([d[0] for d in deals], dtype=object)
+        self.tier = np.array([d[1] for d in deals], dtype=object)
+        self.stage = np.array([d[2] for d in deals], dtype=object)
+        self.close = np.array([d[3] for d in deals], dtype=object)
+        self.total_value = np.array([d[4] for d in deals], dtype=np.float64)
+        self.near_term_value = np.array([d[5] for d in deals], dtype=np.float64)
+        self.probability = np.clip(np.array([d[6] for d in deals], dtype=np.float64), 0.0, 1.0)
+        self.weighted_value = self.total_value * self.probability
+
+    def __len__(self) -> int:
+        return len(self.total_value)
+
+    def values(self, basis: str) -> np.ndarray:
+        """Deal values for a simulation basis: 'total' or 'near_term'."""
+        return self.near_term_value if basis == "near_term" else self.total_value
+
+
+def parse_pipeline_csv(body: bytes) -> PipelineArrays:
+    """Parse the pipeline CSV export into arrays."""
+    reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+    return PipelineArrays(list(reader))
+
+
+# ============================================================================
+# AGGREGATION
+# ============================================================================
+
+def group_pipeline(pipeline: PipelineArrays, labels: np.ndarray, sort_key=None) -> List[Dict[str, Any]]:
+    """Deal count and total/near-term/weighted value per distinct label."""
+    if not len(pipeline):
+        return []
+
+    keys, index = np.unique(labels.astype(str), return_inverse=True)
+    size = len(keys)
+    customers = np.bincount(index, minlength=size)
+    total = np.bincount(index, weights=pipeline.total_value, minlength=size)
+    near_term = np.bincount(index, weights=pipeline.near_term_value, minlength=size)
+    weighted = np.bincount(index, weights=pipeline.weighted_value, minlength=size)
+
+    groups = [
+        {
+            "key": str(keys[i]),
+            "customers": int(customers[i]),
+            "total_value": float(total[i]),
+            "near_term_value": float(near_term[i]),
+            "weighted_value": float(weighted[i]),
+        }
+        for i in range(size)
+    ]
+    if sort_key is None:
+        groups.sort(key=lambda g: -g["weighted_value"])
+    else:
+        groups.sort(key=lambda g: sort_key(g["key"]))
+    return groups
+
+
+def financial_model_weighted() -> Tuple[Optional[float], Optional[str]]:
+    """
+    The weighted pipeline hard-coded in financial-model.json, if readable,
+    and the ETag of the version it was read from (None if there is none).
+    """
+    try:
+        body, etag = data_files["financial-model"].current()
+    except FileNotFoundError:
+        return None, None
+    try:
+        summary = json.loads(body).get("pipelineSummary", {})
+        return parse_money(str(summary.get("weightedPipeline", ""))), etag
+    except (ValueError, AttributeError):
+        return None, etag
+
+
+def summarize_pipeline(pipeline: PipelineArrays, model_weighted: Optional[float]) -> Dict[str, Any]:
+    """
+    Totals plus weighted pipeline by tier, stage and expected close period,
+    compared against the financial model's weighted pipeline.
+    """
+    weighted_total = float(pipeline.weighted_value.sum())
+
+    return {
+        "summary": {
+            "customers": len(pipeline),
+            "excluded": pipeline.excluded,
+            "total_value": float(pipeline.total_value.sum()),
+            "near_term_value": float(pipeline.near_term_value.sum()),
+            "weighted_value": weighted_total,
+            "financial_model_weighted_value": model_weighted,
+            "financial_model_difference": (
+                weighted_total - model_weighted if model_weighted is not None else None
+            ),
+        },
+        "by_tier": group_pipeline(pipeline, pipeline.tier, sort_key=lambda k: (not k.isdigit(), k)),
+        "by_stage": group_pipeline(pipeline, pipeline.stage),
+        "by_close": group_pipeline(pipeline, pipeline.close, sort_key=close_period_key),
+    }
+
+
+# ============================================================================
+# MONTE CARLO
+# ============================================================================
+
+def simulate_revenue(
+    pipeline: PipelineArrays,
+    trials: int,
+    basis: str = "total",
+    seed: Optional[int] = PIPELINE_SIMULATION_SEED
+) -> Dict[str, Any]:
+    """
+    Monte Carlo of booked pipeline value: in each trial every deal closes
+    independently with its probability. Trials are drawn in chunks of
+    PIPELINE_SIMULATION_CHUNK_TRIALS as a (trials x deals) matrix, so the
+    whole simulation is a handful of array operations.
+    """
+    values = pipeline.values(basis)
+    rng = np.random.default_rng(seed)
+    outcomes = np.empty(trials, dtype=np.float64)
+    deals_closed = np.zeros(len(pipeline), dtype=np.int64)
+
+    for start in range(0, trials, PIPELINE_SIMULATION_CHUNK_TRIALS):
+        stop = min(start + PIPELINE_SIMULATION_CHUNK_TRIALS, trials)
+        closed = rng.random((stop - start, len(pipeline))) < pipeline.probability
+        outcomes[start:stop] = closed @ values
+        deals_closed += closed.sum(axis=0)
+
+    percentiles = np.percentile(outcomes, SIMULATION_PERCENTILES)
+    expected = float(values @ pipeline.probability)
+
+    return {
+        "trials": trials,
+        "basis": basis,
+        "seed": seed,
+        "expected_value": expected,
+        "mean": float(outcomes.mean()),
+        "std": float(outcomes.std()),
+        "min": float(outcomes.min()),
+        "max": float(outcomes.max()),
+        "percentiles": {f"p{p}": float(v) for p, v in zip(SIMULATION_PERCENTILES, percentiles)},
+        "probability_at_least_expected": float((outcomes >= expected).mean()),
+        "probability_zero": float((outcomes == 0).mean()),
+        "deals": [
+            {
+                "name": str(name),
+                "probability": float(p),
+                "value": float(v),
+                "simulated_close_rate": float(rate),
+            }
+            for name, p, v, rate in zip(pipeline.names, pipeline.probability, values, deals_closed / trials)
+        ],
+    }
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class PipelineAnalyticsCache:
+    """
+    Parsed pipeline, its summary and recent simulation results, all keyed
+    on the pipeline file's ETag so they are dropped when the file changes.
+    The summary also compares against the financial model, so it is kept
+    with that file's ETag too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._etag: Optional[str] = None
+        self._pipeline: Optional[PipelineArrays] = None
+        # ((pipeline etag, financial model etag), summary)
+        self._summary: Optional[Tuple[Tuple[str, Optional[str]], Dict[str, Any]]] = None
+        self._simulations: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+    def _current(self) -> Tuple[str, PipelineArrays]:
+        body, etag = data_files["pipeline"].current()
+        with self._lock:
+            if etag != self._etag:
+                self._pipeline = parse_pipeline_csv(body)
+                self._summary = None
+                self._simulations.clear()
+                self._etag = etag
+            return self._etag, self._pipeline
+
+    def summary(self) -> Dict[str, Any]:
+        etag, pipeline = self._current()
+        model_weighted, model_etag = financial_model_weighted()
+        key = (etag, model_etag)
+
+        with self._lock:
+            cached = self._summary
+            if cached is not None and cached[0] == key and etag == self._etag:
+                return cached[1]
+
+        result = {
+            "source_etag": etag,
+            "financial_model_etag": model_etag,
+            **summarize_pipeline(pipeline, model_weighted),
+        }
+
+        with self._lock:
+            if etag == self._etag:
+                self._summary = (key, result)
+        return result
+
+    def simulation(self, trials: int, basis: str, seed: Optional[int]) -> Dict[str, Any]:
+        etag, pipeline = self._current()
+        key = (trials, basis, seed)
+
+        # Unseeded runs are meant to differ every time, so never cache them
+        if seed is not None:
+            with self._lock:
+                cached = self._simulations.get(key)
+                if cached is not None and etag == self._etag:
+                    self._simulations.move_to_end(key)
+                    return cached
+
+        result = {"source_etag": etag, **simulate_revenue(pipeline, trials, basis, seed)}
+
+        if seed is not None:
+            with self._lock:
+                if etag == self._etag:
+                    self._simulations[key] = result
+                    while len(self._simulations) > PIPELINE_SIMULATION_CACHE_SIZE:
+                        self._simulations.popitem(last=False)
+        return result
+
+
+pipeline_analytics = PipelineAnalyticsCache()
+
+
+# ============================================================================
+# ENDPOINTS (Founder only)
+# ============================================================================
+
+@router.get("/pipeline")
+async def get_pipeline_analytics(current_user: dict = Depends(require_founder)):
+    """
+    Pipeline totals and weighted value by tier, stage and expected close,
+    computed from the customer pipeline CSV (Founder only).
+    """
+    try:
+        return await run_in_threadpool(pipeline_analytics.summary)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pipeline data is not available."
+        )
+
+
+@router.get("/pipeline/simulation")
+async def get_pipeline_simulation(
+    trials: int = Query(PIPELINE_SIMULATION_DEFAULT_TRIALS, ge=1000, le=PIPELINE_SIMULATION_MAX_TRIALS),
+    basis: str = Query("total", pattern="^(total|near_term)$", description="Deal value to simulate"),
+    seed: Optional[int] = Query(PIPELINE_SIMULATION_SEED, ge=0, description="Omit for the default seed"),
+    random: bool = Query(False, description="Fresh unseeded run instead of the repeatable default"),
+    current_user: dict = Depends(require_founder)
+):
+    """
+    Monte Carlo distribution of pipeline value, each deal closing
+    independently with its probability (Founder only).
+    Seeded results are cached until the pipeline file changes.
+    """
+    try:
+        return await run_in_threadpool(
+            pipeline_analytics.simulation, trials, basis, None if random else seed
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pipeline data is not available."
+        )
@@ -5,7 +5,7 @@ Handles login flow: Email -> Password -> 2FA -> Token
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, status, Request, Depends
+from fastapi import APIRouter, HTTPException, status, Request, Depends, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from models import (
@@ -14,7 +14,7 @@ from models import (
     Setup2FARequest, Setup2FAResponse, Verify2FASetupRequest,
     SuccessResponse, ErrorResponse,
     ForgotPasswordRequest, VerifyResetTokenRequest,
-    VerifyResetCodeRequest, ResetPasswordRequest
+    VerifyResetCodeRequest, ResetPasswordRequest, BulkExtendNDARequest
 )
 from security import (
     verify_password, create_access_token, decode_access_token,
@@ -31,12 +31,17 @@ from database import (
     cleanup_expired_pending_auth,
     create_password_reset_token, verify_password_reset_token,
     verify_password_reset_code, mark_password_reset_used,
-    get_recent_password_reset_requests
+    get_recent_password_reset_requests,
+    sweep_nda_expirations, get_upcoming_nda_expirations, extend_nda_expirations,
+    get_nda_status_summary
 )
+from responses import json_response
+from request_timing import span
 from config import (
     PORTAL_DOMAINS, PORTAL_URLS, ACCESS_TOKEN_EXPIRE_MINUTES,
     MAX_LOGIN_ATTEMPTS, LOCKOUT_DURATION_MINUTES,
-    PASSWORD_RESET_EXPIRE_MINUTES, PASSWORD_RESET_RATE_LIMIT
+    PASSWORD_RESET_EXPIRE_MINUTES, PASSWORD_RESET_RATE_LIMIT,
+    NDA_EXPIRY_WARNING_DAYS
 )
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -436,7 +441,9 @@ async def get_current_user(
         )
 
     # Check if session is valid (not revoked)
-    if not is_session_valid(payload.get("jti", "")):
+    with span("session"):
+        session_valid = is_session_valid(payload.get("jti", ""))
+    if not session_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Session has been revoked.",
@@ -599,7 +606,7 @@ async def forgot_password(request: Request, body: ForgotPasswordRequest):
             detail="Failed to process password reset request. Please try again."
         )
 
-    # Send password reset email
+    # Queue password reset email (delivered by the outbox sender)
     try:
         from email_service import send_password_reset_email, is_email_configured
 
@@ -608,12 +615,13 @@ async def forgot_password(request: Request, body: ForgotPasswordRequest):
                 to_email=email,
                 user_name=user["name"],
                 reset_token=reset_data["token"],
-                reset_code=reset_data["code"]
+                reset_code=reset_data["code"],
+                expires_at=reset_data["expires_at"]
             )
             if email_sent:
-                log_audit(user["id"], "PASSWORD_RESET_EMAIL_SENT", f"Reset email sent", client_ip)
+                log_audit(user["id"], "PASSWORD_RESET_EMAIL_QUEUED", f"Reset email queued", client_ip)
             else:
-                log_audit(user["id"], "PASSWORD_RESET_EMAIL_FAILED", f"Email send failed", client_ip)
+                log_audit(user["id"], "PASSWORD_RESET_EMAIL_FAILED", f"Email queue failed", client_ip)
         else:
             # Email not configured - log for debugging
             log_audit(user["id"], "PASSWORD_RESET_NO_EMAIL", f"Email not configured, token: {reset_data['token'][:8]}...", client_ip)
@@ -737,7 +745,7 @@ async def reset_password(request: Request, body: ResetPasswordRequest):
 
     log_audit(user_id, "PASSWORD_RESET_SUCCESS", "Password reset completed", client_ip)
 
-    # Send password changed notification
+    # Queue password changed notification
     try:
         from email_service import send_password_changed_notification, is_email_configured
 
@@ -788,41 +796,78 @@ def require_founder(current_user: dict = Depends(get_current_user)) -> dict:
     return current_user
 
 
+def _nda_portal_types(portal_type: Optional[str]) -> list:
+    """Validate an NDA portal_type filter; defaults to customers and partners."""
+    if portal_type:
+        if portal_type not in ("customer", "partner"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="portal_type must be 'customer' or 'partner'"
+            )
+        return [portal_type]
+
+    # Customers and partners only (they require NDA)
+    return ["customer", "partner"]
+
+
 @router.get("/nda/users")
 async def list_users_nda_status(
     request: Request,
     portal_type: Optional[str] = None,
+    q: Optional[str] = Query(None, max_length=100, description="Prefix search on email, name or company"),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit for the full list"),
     current_user: dict = Depends(require_founder)
 ):
     """
     List all users with their NDA status (Founder only).
     Optional filter by portal_type: customer, partner
+    Pass limit (and then cursor) to page through the list newest first.
     """
     client_ip = get_client_ip(request)
 
-    # Filter to only customer/partner if specified
-    if portal_type:
-        if portal_type not in ("customer", "partner"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="portal_type must be 'customer' or 'partner'"
-            )
-        users = get_all_users_nda_status([portal_type])
+    portal_types = _nda_portal_types(portal_type)
+    search = q.strip() if q else None
+
+    if limit is None:
+        users = get_all_users_nda_status(portal_types, search)
+        has_more = False
     else:
-        # Get customers and partners only (they require NDA)
-        users = get_all_users_nda_status(["customer", "partner"])
+        users = get_all_users_nda_status(portal_types, search, cursor, limit + 1)
+        has_more = len(users) > limit
+        users = users[:limit]
 
     log_audit(current_user["id"], "NDA_LIST_VIEWED", f"Viewed NDA list", client_ip)
 
-    return {
+    # Always counted in SQL, so overdue approved NDAs count as expired the
+    # same way whether or not the list is paged or searched
+    summary = get_nda_status_summary(portal_types)
+
+    response = {
         "users": users,
         "count": len(users),
-        "summary": {
-            "pending": len([u for u in users if u["nda_status"] == "pending"]),
-            "approved": len([u for u in users if u["nda_status"] == "approved"]),
-            "expired": len([u for u in users if u["nda_status"] == "expired"]),
-            "revoked": len([u for u in users if u["nda_status"] == "revoked"]),
-        }
+        "summary": summary
+    }
+    if limit is not None:
+        response["has_more"] = has_more
+        response["next_cursor"] = users[-1]["id"] if has_more else None
+    return json_response(response)
+
+
+@router.get("/nda/summary")
+async def nda_status_summary(
+    portal_type: Optional[str] = None,
+    current_user: dict = Depends(require_founder)
+):
+    """
+    NDA status counts without the user list (Founder only).
+    For dashboard widgets that only need the numbers.
+    """
+    summary = get_nda_status_summary(_nda_portal_types(portal_type))
+
+    return {
+        "summary": summary,
+        "total": sum(summary.values())
     }
 
 
@@ -985,3 +1030,78 @@ async def extend_user_nda(
         "nda_status": "approved",
         "expires_date": new_expires_date.isoformat()
     }
+
+
+@router.get("/nda/expiring")
+async def list_expiring_ndas(
+    days: int = NDA_EXPIRY_WARNING_DAYS,
+    current_user: dict = Depends(require_founder)
+):
+    """List approved NDAs expiring within the next N days (Founder only)."""
+    users = get_upcoming_nda_expirations(days)
+    return {"users": users, "count": len(users), "days": days}
+
+
+@router.post("/nda/sweep")
+async def sweep_ndas(
+    request: Request,
+    days: int = NDA_EXPIRY_WARNING_DAYS,
+    current_user: dict = Depends(require_founder)
+):
+    """
+    Run the NDA expiry sweep now (Founder only).
+    Also runs on a schedule; can be triggered externally (e.g. Cloud Scheduler).
+    """
+    client_ip = get_client_ip(request)
+
+    result = sweep_nda_expirations(days)
+
+    log_audit(
+        current_user["id"],
+        "NDA_EXPIRY_SWEEP",
+        f"Expired {result['expired']} NDAs, {len(result['expiring'])} expiring within {days} days",
+        client_ip
+    )
+
+    return {
+        "success": True,
+        "expired": result["expired"],
+        "expiring": result["expiring"],
+        "expiring_count": len(result["expiring"])
+    }
+
+
+@router.post("/nda/extend-bulk")
+async def extend_ndas_bulk(
+    request: Request,
+    body: BulkExtendNDARequest,
+    current_user: dict = Depends(require_founder)
+):
+    """
+    Extend NDA expiration for several customers/partners at once (Founder only).
+    Only approved or expired NDAs are extended; other ids are returned in skipped_ids.
+    """
+    client_ip = get_client_ip(request)
+
+    new_expires_date = datetime.utcnow() + timedelta(days=body.expires_days)
+    extended = extend_nda_expirations(body.user_ids, new_expires_date)
+    extended_ids = {user["id"] for user in extended}
+    skipped_ids = [user_id for user_id in dict.fromkeys(body.user_ids) if user_id not in extended_ids]
+
+    log_audit(
+        current_user["id"],
+        "NDA_EXTENDED_BULK",
+        f"Extended {len(extended)} NDAs to {new_expires_date}: "
+        f"{', '.join(user['email'] for user in extended) or 'none'}"
+        + (f"; skipped ids {', '.join(map(str, skipped_ids))}" if skipped_ids else ""),
+        client_ip
+    )
+
+    return {
+        "success": True,
+        "message": f"Extended {len(extended)} NDAs",
+        "updated": len(extended),
+        "updated_ids": sorted(extended_ids),
+        "skipped_ids": skipped_ids,
+        "expires_date": new_expires_date.isoformat()
+    }
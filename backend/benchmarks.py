@@ -0,0 +1,356 @@
+"""
+LVS Portal - Micro-benchmarks
+Quick timings for hot paths. Run from backend/:
+
+    python benchmarks.py            # all benchmarks
+    python benchmarks.py email      # just one
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+
+def report(label: str, seconds_per_call: float) -> None:
+    """Print one timing line in microseconds per call."""
+    print(f"  {label:<48} {seconds_per_call * 1e6:>10.1f} us/call")
+
+
+def time_per_call(func: Callable[[], object], number: int) -> float:
+    """Best-of-5 seconds per call."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+# ============================================================================
+# EMAIL
+# ============================================================================
+
+class _AcceptHandler(BaseHTTPRequestHandler):
+    """Stand-in for SendGrid: accept every message with 202, keep-alive."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_email() -> None:
+    """Template render cost and per-message send overhead."""
+    from email_service import (
+        SendGridTransport, render_password_reset_email, render_password_changed_email
+    )
+
+    print("email: render")
+    report("password reset (html + text)", time_per_call(
+        lambda: render_password_reset_email("Kevin", "x" * 43, "123456"), 20000
+    ))
+    report("password changed (html + text)", time_per_call(
+        lambda: render_password_changed_email("Kevin", "203.0.113.7"), 20000
+    ))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _AcceptHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v3/mail/send"
+    subject, html_content, text_content = render_password_reset_email("Kevin", "x" * 43, "123456")
+
+    def send_with_new_client():
+        transport = SendGridTransport("bench-key", url)
+        transport.send("bench@example.com", subject, html_content, text_content)
+        transport.close()
+
+    shared = SendGridTransport("bench-key", url)
+
+    def send_with_shared_client():
+        shared.send("bench@example.com", subject, html_content, text_content)
+
+    print("email: send to local stand-in (plain HTTP, so no TLS handshake is saved)")
+    report("new client per message", time_per_call(send_with_new_client, 200))
+    report("shared keep-alive client", time_per_call(send_with_shared_client, 200))
+
+    shared.close()
+    server.shutdown()
+    server.server_close()
+
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+async def _asgi_get(app, path: str, headers: List[Tuple[bytes, bytes]]) -> int:
+    """Drive one GET through an ASGI app in-process and return the status."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": headers,
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+    }
+    disconnected = asyncio.Event()
+    body_sent = False
+    status_code = 0
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return status_code
+
+
+def _requests_per_second(app, path: str, headers: List[Tuple[bytes, bytes]], number: int) -> float:
+    """Best-of-3 sequential requests per second through the ASGI stack."""
+    async def run() -> float:
+        assert await _asgi_get(app, path, headers) == 200
+        best = 0.0
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(number):
+                await _asgi_get(app, path, headers)
+            best = max(best, number / (time.perf_counter() - start))
+        return best
+
+    return asyncio.run(run())
+
+
+def bench_middleware() -> None:
+    """Security headers: BaseHTTPMiddleware (previous) vs plain ASGI (current)."""
+    from datetime import datetime, timedelta
+
+    from fastapi import FastAPI
+    from starlette.middleware import Middleware
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    import database
+    import main
+    from security import create_access_token, decode_access_token
+
+    class BaseHTTPSecurityHeaders(BaseHTTPMiddleware):
+        """The previous implementation, kept here for comparison."""
+
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            for name, value in main.SECURITY_HEADERS:
+                response.headers[name.decode()] = value.decode()
+            return response
+
+    # Throwaway database with one signed-in user for the authenticated route
+    tmp = tempfile.TemporaryDirectory()
+    database.DB_PATH = Path(tmp.name) / "bench.db"
+    database.init_database()
+    user_id = database.create_user("bench@lolavisionsystems.com", "bench-password-1", "Bench", "founder")
+    token = create_access_token({"sub": str(user_id)})
+    jti = decode_access_token(token)["jti"]
+    database.create_session(user_id, jti, datetime.utcnow() + timedelta(hours=1))
+    auth = [(b"authorization", f"Bearer {token}".encode())]
+
+    variants = [
+        ("no middleware", []),
+        ("BaseHTTPMiddleware", [Middleware(BaseHTTPSecurityHeaders)]),
+        ("ASGI middleware", [Middleware(main.SecurityHeadersMiddleware)]),
+    ]
+    routes = [("/health", [], 2000), ("/auth/me", auth, 500)]
+
+    for path, headers, number in routes:
+        print(f"middleware: GET {path} (in-process, requests/second, higher is better)")
+        for label, middleware in variants:
+            app = FastAPI(routes=main.app.router.routes, middleware=middleware)
+            rps = _requests_per_second(app, path, headers, number)
+            print(f"  {label:<48} {rps:>10.0f} req/s")
+
+    tmp.cleanup()
+
+
+# ============================================================================
+# JSON RESPONSES
+# ============================================================================
+
+def _sample_payloads(rows: int):
+    """/admin/users, /nda/all and comment-thread payloads with `rows` items each."""
+    from comments import CommentResponse, CommentsListResponse
+    from nda import NDADocumentResponse
+
+    now = "2026-01-15T09:30:00.123456"
+    users = {
+        "users": [
+            {
+                "id": i, "email": f"user{i}@example.com", "name": f"User {i}",
+                "portal_type": "customer", "company": "koniku", "is_active": True,
+                "has_2fa": bool(i % 2), "nda_status": "approved",
+                "created_at": now, "last_login": now,
+            }
+            for i in range(rows)
+        ],
+        "count": rows, "has_more": True, "next_cursor": 1,
+    }
+    ndas = [
+        NDADocumentResponse(
+            id=i, user_id=i, filename=f"nda-{i}.pdf", file_size=123456,
+            content_type="application/pdf", status="approved", uploaded_at=now,
+            reviewer_name="Kevin", reviewed_at=now, review_notes="Looks good",
+            email=f"user{i}@example.com", name=f"User {i}", company="koniku",
+            portal_type="customer", preview_url=f"/nda/{i}/preview"
+        )
+        for i in range(rows)
+    ]
+    comments = CommentsListResponse(
+        account_id="koniku",
+        comments=[
+            CommentResponse(
+                id=i, account_id="koniku", message="Followed up on the pilot timeline " * 3,
+                created_at=now, user_id=1, user_name="Kevin", display_name="Kevin (LVS)"
+            )
+            for i in range(rows)
+        ],
+        count=rows, oldest_id=0, newest_id=rows - 1,
+    )
+
+    return users, ndas, comments
+
+
+def bench_json() -> None:
+    """Response encoding for the list endpoints: FastAPI default vs responses.py."""
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from comments import CommentsListResponse
+    from nda import NDADocumentResponse
+    from responses import ORJSON_AVAILABLE, json_response, model_response
+
+    rows = 500
+    users, ndas, comments = _sample_payloads(rows)
+
+    loop = asyncio.new_event_loop()
+
+    def fastapi_default(content, response_model=None) -> bytes:
+        """What FastAPI does with a returned value: encode/validate, then json.dumps."""
+        field = create_response_field(name="Response", type_=response_model) if response_model else None
+        data = loop.run_until_complete(serialize_response(field=field, response_content=content))
+        return JSONResponse(data).body
+
+    cases = [
+        ("/admin/users", lambda: fastapi_default(users), lambda: json_response(users).body),
+        ("/nda/all", lambda: fastapi_default(ndas, List[NDADocumentResponse]), lambda: model_response(ndas).body),
+        ("/comments/{account_id}", lambda: fastapi_default(comments, CommentsListResponse),
+         lambda: model_response(comments).body),
+    ]
+
+    print(f"json: encode {rows}-item responses (orjson {'on' if ORJSON_AVAILABLE else 'not installed'})")
+    for path, before, after in cases:
+        assert json.loads(before()) == json.loads(after())
+        report(f"{path} FastAPI default", time_per_call(before, 20))
+        report(f"{path} responses.py", time_per_call(after, 20))
+
+    loop.close()
+
+
+# ============================================================================
+# COMPRESSION
+# ============================================================================
+
+def bench_compression() -> None:
+    """Bytes on the wire vs CPU per response for gzip levels and brotli qualities."""
+    import zlib
+
+    from compression import BROTLI_AVAILABLE
+    from config import COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+    from responses import json_response, model_response
+
+    users, ndas, comments = _sample_payloads(500)
+    bodies = [
+        ("/admin/users (500)", json_response(users).body),
+        ("/nda/all (500)", model_response(ndas).body),
+        ("/comments/{account_id} (500)", model_response(comments).body),
+    ]
+
+    def gzip_codec(level: int):
+        def compress(data: bytes) -> bytes:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            return compressor.compress(data) + compressor.flush()
+        return compress
+
+    codecs = [(f"gzip {level}", level == COMPRESSION_GZIP_LEVEL, gzip_codec(level)) for level in (1, 6, 9)]
+    if BROTLI_AVAILABLE:
+        import brotli
+        codecs += [
+            (f"br {quality}", quality == COMPRESSION_BROTLI_QUALITY,
+             lambda data, quality=quality: brotli.compress(data, quality=quality))
+            for quality in (1, 4, 6)
+        ]
+
+    # Transfer time on a slow link, to weigh against the CPU cost
+    link_bits_per_second = 2_000_000
+
+    def transfer_ms(size: int) -> float:
+        return size * 8 / link_bits_per_second * 1000
+
+    print("compression: size, CPU per response, transfer time at 2 Mbit/s (* = configured)")
+    for label, body in bodies:
+        print(f"  {label}: {len(body)} bytes uncompressed, {transfer_ms(len(body)):.0f} ms")
+        for name, configured, compress in codecs:
+            size = len(compress(body))
+            seconds = time_per_call(lambda: compress(body), 10)
+            marker = "*" if configured else " "
+            print(f"    {marker}{name:<8} {size:>8} bytes {size / len(body):>6.1%} "
+                  f"{seconds * 1e6:>9.0f} us/call {transfer_ms(size):>6.0f} ms")
+    if not BROTLI_AVAILABLE:
+        print("  (brotli not installed; gzip only)")
+
+
+# ============================================================================
+# PIPELINE ANALYTICS
+# ============================================================================
+
+def bench_analytics() -> None:
+    """Pipeline CSV parse, breakdowns and Monte Carlo at several trial counts."""
+    from analytics import parse_pipeline_csv, financial_model_weighted, summarize_pipeline, simulate_revenue
+    from portal_data import data_files
+
+    body, _ = data_files["pipeline"].current()
+    pipeline = parse_pipeline_csv(body)
+    model_weighted, _ = financial_model_weighted()
+
+    print(f"analytics: {len(pipeline)}-deal pipeline")
+    report("parse CSV into arrays", time_per_call(lambda: parse_pipeline_csv(body), 200))
+    report("breakdowns by tier, stage and close", time_per_call(lambda: summarize_pipeline(pipeline, model_weighted), 200))
+    for trials in (10_000, 100_000, 1_000_000):
+        report(f"Monte Carlo, {trials:,} trials", time_per_call(lambda: simulate_revenue(pipeline, trials), 1))
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "email": bench_email,
+    "middleware": bench_middleware,
+    "json": bench_json,
+    "compression": bench_compression,
+    "analytics": bench_analytics,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        sys.exit(f"Unknown benchmark(s): {', '.join(unknown)}. Choose from: {', '.join(BENCHMARKS)}")
+
+    for name in names:
+        BENCHMARKS[name]()
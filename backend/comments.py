@@ -2,16 +2,30 @@
 LVS Portal - Account Comments API
 Slack-like comments/notes for customer accounts
 """
-from typing import Optional, List
+import asyncio
+import hashlib
+import html
+import json
+import re
+from typing import Optional, List, Dict, Set, Any
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, status, Request, Depends
+from fastapi import APIRouter, HTTPException, status, Request, Depends, Query, Header
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 
-from auth import get_current_user, get_client_ip
+from auth import get_current_user, require_founder, get_client_ip
+from responses import model_response
 from database import (
-    create_comment, get_comments, delete_comment,
-    get_user_display_name, log_audit
+    create_comment, get_comments, get_comments_for_accounts, delete_comment,
+    mark_comments_read, get_unread_comment_counts,
+    get_user_display_name, log_audit, get_comment_version,
+    search_comments, rebuild_comment_search_index, compact_deleted_comments
+)
+from config import (
+    COMMENT_BATCH_MAX_ACCOUNTS, COMMENT_UNREAD_COUNT_CAP, COMMENT_STREAM_HEARTBEAT_SECONDS,
+    COMMENT_STREAM_QUEUE_SIZE, COMMENT_STREAM_REPLAY_LIMIT,
+    COMMENT_RETENTION_DAYS, COMMENT_COMPACTION_BATCH_SIZE
 )
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
@@ -37,54 +51,361 @@ class CommentResponse(BaseModel):
     is_own: bool = False  # True if current user posted this
 
 
+class CommentSearchResult(CommentResponse):
+    snippet: str  # HTML-escaped excerpt, matches wrapped in <mark>
+
+
+class CommentSearchResponse(BaseModel):
+    query: str
+    results: List[CommentSearchResult]
+    count: int
+    offset: int
+    has_more: bool = False
+
+
 class CommentsListResponse(BaseModel):
     account_id: str
     comments: List[CommentResponse]
     count: int
+    has_more: bool = False  # More comments exist beyond this page
+    oldest_id: Optional[int] = None  # Pass as `before` to load older comments
+    newest_id: Optional[int] = None  # Pass as `after` to load newer comments
+
+
+class AccountCommentsSummary(BaseModel):
+    comments: List[CommentResponse]
+    count: int  # All comments on the account, not just the ones returned
+
+
+class CommentsBatchResponse(BaseModel):
+    accounts: Dict[str, AccountCommentsSummary]
+    limit: int
+
+
+class MarkReadRequest(BaseModel):
+    last_seen_comment_id: Optional[int] = None  # Defaults to the latest comment
+
+
+class UnreadCountsResponse(BaseModel):
+    unread: Dict[str, int]  # Only accounts with unread comments, at most `cap` each
+    total: int              # Sum of unread; a lower bound when `capped` is non-empty
+    cap: int                # Per-account limit on the counts
+    capped: List[str] = []  # Accounts with more than `cap` unread (show "cap+")
+
+
+# ============================================================================
+# LIVE UPDATES (in-process pub/sub)
+# ============================================================================
+
+class CommentSubscriber:
+    """One streaming connection. The bounded queue is its backpressure limit."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=COMMENT_STREAM_QUEUE_SIZE)
+        self.overflowed = False
+
+
+class CommentBroker:
+    """
+    Fan out comment events to streaming connections, per account.
+    In-process only: each API instance notifies its own subscribers.
+    Publish never blocks; a subscriber whose queue is full is dropped and
+    told to resync, so one slow client can't hold events for everyone.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[CommentSubscriber]] = {}
+
+    def subscribe(self, account_id: str) -> CommentSubscriber:
+        subscriber = CommentSubscriber()
+        self._subscribers.setdefault(account_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, account_id: str, subscriber: CommentSubscriber) -> None:
+        subscribers = self._subscribers.get(account_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[account_id]
+
+    def publish(self, account_id: str, event: str, data: Dict[str, Any]) -> None:
+        for subscriber in list(self._subscribers.get(account_id, ())):
+            try:
+                subscriber.queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+                self.unsubscribe(account_id, subscriber)
+
+
+comment_broker = CommentBroker()
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Events message."""
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+def build_comment_response(c: Dict[str, Any], current_user_id: int) -> CommentResponse:
+    """Build a CommentResponse from a get_comments row."""
+    display_name = get_user_display_name({
+        'name': c.get('name'),
+        'company': c.get('company'),
+        'portal_type': c.get('portal_type')
+    })
+
+    return CommentResponse(
+        id=c['id'],
+        account_id=c['account_id'],
+        message=c['message'],
+        created_at=str(c['created_at']),
+        edited_at=str(c['edited_at']) if c.get('edited_at') else None,
+        user_id=c['user_id'],
+        user_name=c.get('name', 'Unknown'),
+        display_name=display_name,
+        is_own=c['user_id'] == current_user_id
+    )
+
+
+def build_fts_query(q: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    Every word is quoted (so FTS operators in user input are literal) and
+    the last word is a prefix match for search-as-you-type.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:16]]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def highlight_snippet(snippet: str) -> str:
+    """Escape a search snippet and turn the FTS match markers into <mark> tags."""
+    return html.escape(snippet).replace("\x02", "<mark>").replace("\x03", "</mark>")
 
 
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
 
+# Declared before /{account_id} so "search" isn't taken as an account id
+@router.get("/search", response_model=CommentSearchResponse)
+async def search_account_comments(
+    q: str = Query(..., min_length=1, max_length=200),
+    account_id: Optional[str] = Query(None, description="Limit to one account"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(require_founder)
+):
+    """
+    Full-text search across account comments, best matches first (Founder only).
+    """
+    fts_query = build_fts_query(q)
+    if not fts_query:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query must contain at least one word."
+        )
+
+    try:
+        rows = search_comments(fts_query, account_id, limit + 1, offset)
+    except Exception as e:
+        print(f"Comment search error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Comment search is not available."
+        )
+
+    has_more = len(rows) > limit
+    results = [
+        CommentSearchResult(
+            **build_comment_response(row, current_user['id']).model_dump(),
+            snippet=highlight_snippet(row['snippet'])
+        )
+        for row in rows[:limit]
+    ]
+
+    return model_response(CommentSearchResponse(
+        query=q,
+        results=results,
+        count=len(results),
+        offset=offset,
+        has_more=has_more
+    ))
+
+
+@router.post("/search/rebuild")
+async def rebuild_search_index(
+    request: Request,
+    current_user: dict = Depends(require_founder)
+):
+    """Rebuild the comment search index from the comments table (Founder only)."""
+    client_ip = get_client_ip(request)
+
+    try:
+        indexed = rebuild_comment_search_index()
+    except Exception as e:
+        print(f"Comment search rebuild error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Comment search is not available."
+        )
+
+    log_audit(current_user['id'], "COMMENT_SEARCH_REBUILT", f"Indexed {indexed} comments", client_ip)
+
+    return {"success": True, "indexed": indexed}
+
+
+@router.get("/batch", response_model=CommentsBatchResponse)
+async def get_comments_batch(
+    account_ids: str = Query(..., description="Comma-separated account IDs"),
+    limit: int = Query(5, ge=1, le=50, description="Latest comments per account"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Latest comments and comment counts for several accounts at once.
+    Lets the dashboard fill every account card with one request instead
+    of one GET /comments/{account_id} per card.
+    """
+    ids = list(dict.fromkeys(a.strip() for a in account_ids.split(",") if a.strip()))
+    if not ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one account ID is required."
+        )
+    if len(ids) > COMMENT_BATCH_MAX_ACCOUNTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many accounts. Maximum {COMMENT_BATCH_MAX_ACCOUNTS} per request."
+        )
+
+    batch = get_comments_for_accounts(ids, limit)
+
+    return model_response(CommentsBatchResponse(
+        accounts={
+            account_id: AccountCommentsSummary(
+                comments=[build_comment_response(c, current_user['id']) for c in entry["comments"]],
+                count=entry["count"]
+            )
+            for account_id, entry in batch.items()
+        },
+        limit=limit
+    ))
+
+
+@router.post("/compact")
+async def compact_comments(
+    request: Request,
+    retention_days: int = Query(COMMENT_RETENTION_DAYS, ge=0),
+    current_user: dict = Depends(require_founder)
+):
+    """
+    Permanently remove deleted comments older than retention_days (Founder only).
+    Also runs on a schedule.
+    """
+    client_ip = get_client_ip(request)
+
+    result = compact_deleted_comments(retention_days, COMMENT_COMPACTION_BATCH_SIZE)
+
+    log_audit(
+        current_user['id'],
+        "COMMENT_COMPACTION",
+        f"Removed {result['reclaimed']} deleted comments, freed {result['freed_pages']} pages",
+        client_ip
+    )
+
+    return {"success": True, **result}
+
+
+@router.get("/unread", response_model=UnreadCountsResponse)
+async def get_unread_counts(current_user: dict = Depends(get_current_user)):
+    """
+    Unread comment counts for every account, for rendering badges without
+    downloading threads. Comments by the current user never count as unread.
+    Each account's count stops at COMMENT_UNREAD_COUNT_CAP; accounts with
+    more are listed in `capped`, and `total` is then a lower bound.
+    """
+    # One past the cap tells "exactly cap" apart from "more than cap"
+    counts = get_unread_comment_counts(current_user['id'], COMMENT_UNREAD_COUNT_CAP + 1)
+    capped = sorted(account for account, count in counts.items() if count > COMMENT_UNREAD_COUNT_CAP)
+    unread = {account: min(count, COMMENT_UNREAD_COUNT_CAP) for account, count in counts.items()}
+    return UnreadCountsResponse(
+        unread=unread,
+        total=sum(unread.values()),
+        cap=COMMENT_UNREAD_COUNT_CAP,
+        capped=capped
+    )
+
+
+def comments_etag(account_id: str, version: int, user_id: int, *page_params) -> str:
+    """
+    ETag for one view of a comment thread.
+    Varies with the thread version, the viewer (is_own) and the page requested.
+    """
+    view_key = hashlib.sha1(repr((account_id, user_id, page_params)).encode()).hexdigest()[:16]
+    return f'W/"v{version}-{view_key}"'
+
+
 @router.get("/{account_id}", response_model=CommentsListResponse)
 async def get_account_comments(
+    request: Request,
     account_id: str,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    before: Optional[int] = Query(None, description="Only comments older than this comment id"),
+    after: Optional[int] = Query(None, description="Only comments newer than this comment id"),
+    newest_first: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Get all comments for an account.
+    Get a page of comments for an account (newest page by default).
     Account ID can be a customer company name (e.g., 'koniku', 'anduril')
     or a user email for investor/partner accounts.
+    Use `before`/`after` with oldest_id/newest_id from a previous page to
+    scroll back or fetch only new comments.
+    Send the returned ETag as If-None-Match to get a 304 when nothing changed.
     """
-    comments = get_comments(account_id, limit)
-
-    comment_responses = []
-    for c in comments:
-        display_name = get_user_display_name({
-            'name': c.get('name'),
-            'company': c.get('company'),
-            'portal_type': c.get('portal_type')
-        })
-
-        comment_responses.append(CommentResponse(
-            id=c['id'],
-            account_id=c['account_id'],
-            message=c['message'],
-            created_at=str(c['created_at']),
-            edited_at=str(c['edited_at']) if c.get('edited_at') else None,
-            user_id=c['user_id'],
-            user_name=c.get('name', 'Unknown'),
-            display_name=display_name,
-            is_own=c['user_id'] == current_user['id']
-        ))
-
-    return CommentsListResponse(
+    if before is not None and after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either 'before' or 'after', not both."
+        )
+
+    # Answer conditional requests from the version row alone
+    etag = comments_etag(
+        account_id, get_comment_version(account_id), current_user['id'],
+        limit, before, after, newest_first
+    )
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    # One extra row tells us whether another page exists
+    comments = get_comments(account_id, limit + 1, before=before, after=after, newest_first=newest_first)
+    has_more = len(comments) > limit
+    if has_more:
+        # The extra row is the one furthest from the cursor
+        if (after is not None) == newest_first:
+            comments = comments[1:]
+        else:
+            comments = comments[:-1]
+
+    comment_responses = [build_comment_response(c, current_user['id']) for c in comments]
+
+    ids = [c.id for c in comment_responses]
+    ordered = ids[::-1] if newest_first else ids
+
+    return model_response(CommentsListResponse(
         account_id=account_id,
         comments=comment_responses,
-        count=len(comment_responses)
-    )
+        count=len(comment_responses),
+        has_more=has_more,
+        oldest_id=ordered[0] if ordered else None,
+        newest_id=ordered[-1] if ordered else None
+    ), headers=cache_headers)
 
 
 @router.post("/{account_id}", response_model=CommentResponse)
@@ -133,7 +454,7 @@ async def post_comment(
 
     display_name = get_user_display_name(current_user)
 
-    return CommentResponse(
+    comment = CommentResponse(
         id=comment_id,
         account_id=account_id,
         message=body.message.strip(),
@@ -144,6 +465,28 @@ async def post_comment(
         is_own=True
     )
 
+    comment_broker.publish(account_id, "comment", comment.model_dump(exclude={"is_own"}))
+
+    return comment
+
+
+@router.post("/{account_id}/read")
+async def mark_account_read(
+    account_id: str,
+    body: Optional[MarkReadRequest] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Mark an account's comments as read up to a comment id
+    (or up to the latest comment when no id is given).
+    """
+    last_seen = mark_comments_read(
+        current_user['id'],
+        account_id,
+        body.last_seen_comment_id if body else None
+    )
+    return {"success": True, "account_id": account_id, "last_seen_comment_id": last_seen}
+
 
 @router.delete("/{account_id}/{comment_id}")
 async def remove_comment(
@@ -174,9 +517,80 @@ async def remove_comment(
         client_ip
     )
 
+    comment_broker.publish(account_id, "comment_deleted", {"id": comment_id, "account_id": account_id})
+
     return {"success": True, "message": "Comment deleted."}
 
 
+@router.get("/{account_id}/stream")
+async def stream_account_comments(
+    request: Request,
+    account_id: str,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+    after: Optional[int] = Query(None, description="Resume after this comment id"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream new and deleted comments for an account as Server-Sent Events.
+    Requires the Authorization header, so browsers should read it with
+    fetch() rather than EventSource.
+
+    Events: `comment` (id = comment id), `comment_deleted`, and `resync`
+    when the client fell too far behind and should refetch the thread.
+    Reconnect with Last-Event-ID (or ?after=) to replay missed comments.
+    """
+    resume_after = last_event_id if last_event_id is not None else after
+    user_id = current_user['id']
+
+    # Subscribe before replaying so nothing posted in between is lost
+    subscriber = comment_broker.subscribe(account_id)
+
+    async def event_stream():
+        last_sent_id = resume_after or 0
+        try:
+            yield f"retry: {COMMENT_STREAM_HEARTBEAT_SECONDS * 1000}\n\n"
+
+            if resume_after is not None:
+                missed = get_comments(account_id, COMMENT_STREAM_REPLAY_LIMIT + 1, after=resume_after)
+                if len(missed) > COMMENT_STREAM_REPLAY_LIMIT:
+                    yield format_sse("resync", {"reason": "too_many_missed"})
+                    return
+                for c in missed:
+                    yield format_sse("comment", build_comment_response(c, user_id).model_dump(), c['id'])
+                    last_sent_id = c['id']
+
+            while True:
+                if subscriber.overflowed and subscriber.queue.empty():
+                    yield format_sse("resync", {"reason": "slow_consumer"})
+                    return
+
+                try:
+                    event, data = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=COMMENT_STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": heartbeat\n\n"
+                    continue
+
+                if event == "comment":
+                    if data['id'] <= last_sent_id:
+                        continue  # Already sent during replay
+                    last_sent_id = data['id']
+                    yield format_sse(event, {**data, "is_own": data['user_id'] == user_id}, data['id'])
+                else:
+                    yield format_sse(event, data)
+        finally:
+            comment_broker.unsubscribe(account_id, subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ============================================================================
 # HELPER ENDPOINT - Get current user's display name
 # ============================================================================
@@ -0,0 +1,189 @@
+"""
+LVS Portal - Response Compression
+gzip (and brotli, when installed) for large text responses
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import (
+    COMPRESSION_MINIMUM_SIZE, COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_BROTLI_ENABLED, COMPRESSION_BROTLI_QUALITY, COMPRESSION_CONTENT_TYPES
+)
+
+# brotli is optional - gzip alone covers every browser
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the content coding for a response from the Accept-Encoding header:
+    "br" if allowed and available, else "gzip", else None (send as-is).
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        accepted[coding] = weight
+
+    def allowed(coding: str) -> bool:
+        return accepted.get(coding, accepted.get("*", 0.0)) > 0
+
+    if COMPRESSION_BROTLI_ENABLED and BROTLI_AVAILABLE and allowed("br"):
+        return "br"
+    if allowed("gzip"):
+        return "gzip"
+    return None
+
+
+class Compressor:
+    """Incremental gzip or brotli compressor with a common interface."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk; output may be held back until flush()/finish()."""
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        """Emit everything compressed so far so the client can decode it now."""
+        if self.encoding == "br":
+            return self._brotli.flush()
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """End the compressed stream."""
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def is_compressible(headers: Headers) -> bool:
+    """Allowlisted media type, not already encoded, and transforms permitted."""
+    if "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", "").lower():
+        return False
+    media_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    return media_type in COMPRESSION_CONTENT_TYPES
+
+
+class CompressionMiddleware:
+    """
+    Compress allowlisted responses for clients that accept gzip or brotli.
+
+    Complete responses under COMPRESSION_MINIMUM_SIZE are sent as-is.
+    Streaming responses (exports, import progress) are compressed chunk by
+    chunk with a sync flush after each, so every chunk still reaches the
+    client as soon as it is produced. Media types outside the allowlist,
+    including text/event-stream, pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """Per-request send wrapper used by CompressionMiddleware."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            if not is_compressible(Headers(raw=message.get("headers", []))):
+                # Send headers now: an event stream must not wait for its first event
+                self.passthrough = True
+                await self._send(message)
+                return
+            # Held until the first body chunk shows whether it is worth compressing
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.compressor = Compressor(self.encoding)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            # A strong ETag names exact bytes; the compressed body is different bytes
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+
+            if not more_body:
+                # Whole body in one message: compress it and fix the length
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self._send(self.start_message)
+
+        if more_body:
+            if not body:
+                return
+            body = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            body = self.compressor.compress(body) + self.compressor.finish()
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
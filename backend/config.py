@@ -56,6 +56,21 @@ TOTP_VALID_WINDOW = 1  # Allow 1 period before/after for clock drift
 # Password requirements
 MIN_PASSWORD_LENGTH = 8
 
+# Threads hashing passwords in parallel for bulk user creation
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Users inserted per transaction by bulk creation
+BULK_USER_CHUNK_SIZE = 100
+# CSV user import: rows per batch (hashed together, one progress line each)
+IMPORT_BATCH_SIZE = 50
+IMPORT_MAX_ROWS = 10000
+
+# Founder data exports: rows fetched per query, bytes buffered per response chunk
+EXPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Founder user listing: page size when a cursor is passed without a limit
+USER_LIST_PAGE_SIZE = 100
+
 # Rate limiting
 MAX_LOGIN_ATTEMPTS = 5
 LOCKOUT_DURATION_MINUTES = 15
@@ -127,10 +142,176 @@ USER_PASSWORD_PREFIX = os.getenv("USER_PASSWORD_PREFIX", "")
 # ============================================================================
 
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+SENDGRID_API_URL = os.getenv("SENDGRID_API_URL", "https://api.sendgrid.com/v3/mail/send")
 SENDGRID_FROM_EMAIL = os.getenv("SENDGRID_FROM_EMAIL", "noreply@lolavisionsystems.com")
 SENDGRID_FROM_NAME = os.getenv("SENDGRID_FROM_NAME", "Lola Vision Systems")
 PORTAL_URL = os.getenv("PORTAL_URL", "https://lvs-portal-657638018776.us-central1.run.app")
 
+# Delivery transport: "sendgrid", or "file" to append messages as JSON lines
+# to EMAIL_FILE_SINK_PATH instead of sending them (local development/tests)
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "sendgrid").lower()
+EMAIL_FILE_SINK_PATH = os.getenv("EMAIL_FILE_SINK_PATH", str(BASE_DIR / "email_outbox.jsonl"))
+
+# Outbox sender: request handlers only queue, a background job delivers
+EMAIL_OUTBOX_POLL_SECONDS = int(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6         # Then the message is dead-lettered
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30  # Doubles after every failed attempt
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+EMAIL_OUTBOX_LEASE_SECONDS = 300      # Claimed messages are retried after this if the sender dies
+# Sent emails (and expired dead letters) are deleted after this many days
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "7"))
+# How often the purge job runs (0 disables the loop)
+EMAIL_OUTBOX_PURGE_INTERVAL_MINUTES = int(os.getenv("EMAIL_OUTBOX_PURGE_INTERVAL_MINUTES", "360"))
+
 # Password reset settings
 PASSWORD_RESET_EXPIRE_MINUTES = 15
 PASSWORD_RESET_RATE_LIMIT = 3  # Max requests per hour per email
+
+# ============================================================================
+# NDA DOCUMENT PREVIEWS
+# ============================================================================
+
+# Longest edge (px) of the first-page thumbnails shown in the review queue
+NDA_PREVIEW_MAX_PX = int(os.getenv("NDA_PREVIEW_MAX_PX", "480"))
+# Largest source image decoded for a preview (a 600 dpi Letter scan is ~34M px)
+NDA_PREVIEW_MAX_SOURCE_PIXELS = int(os.getenv("NDA_PREVIEW_MAX_SOURCE_PIXELS", "40000000"))
+
+# ============================================================================
+# NDA EXPIRY SWEEP
+# ============================================================================
+
+# How often the background sweep expires overdue NDAs (0 disables the loop)
+NDA_EXPIRY_SWEEP_INTERVAL_MINUTES = int(os.getenv("NDA_EXPIRY_SWEEP_INTERVAL_MINUTES", "60"))
+# Window for reporting NDAs that are about to expire
+NDA_EXPIRY_WARNING_DAYS = 30
+
+# ============================================================================
+# COMMENT STREAMING (Server-Sent Events)
+# ============================================================================
+
+COMMENT_STREAM_HEARTBEAT_SECONDS = 15  # Keep-alive comment through proxies
+COMMENT_STREAM_QUEUE_SIZE = 100        # Buffered events per connection before resync
+COMMENT_STREAM_REPLAY_LIMIT = 200      # Max comments replayed from Last-Event-ID
+
+# ============================================================================
+# COMMENT BATCH FETCH
+# ============================================================================
+
+COMMENT_BATCH_MAX_ACCOUNTS = 100  # Account IDs per GET /comments/batch
+
+# ============================================================================
+# COMMENT UNREAD COUNTS
+# ============================================================================
+
+# Per-account unread counts stop here (badges show "N+"), which bounds the
+# work for threads a user has never opened
+COMMENT_UNREAD_COUNT_CAP = 100
+
+# ============================================================================
+# COMMENT COMPACTION
+# ============================================================================
+
+# Soft-deleted comments are kept this long before being removed for good
+COMMENT_RETENTION_DAYS = int(os.getenv("COMMENT_RETENTION_DAYS", "30"))
+# How often the compaction job runs (0 disables the loop)
+COMMENT_COMPACTION_INTERVAL_MINUTES = int(os.getenv("COMMENT_COMPACTION_INTERVAL_MINUTES", "360"))
+# Rows removed per transaction
+COMMENT_COMPACTION_BATCH_SIZE = 500
+
+# ============================================================================
+# RESPONSE COMPRESSION
+# ============================================================================
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Smaller bodies go out as-is: the gzip header and the CPU aren't worth it
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# Brotli is used when the client accepts it and the brotli package is installed
+COMPRESSION_BROTLI_ENABLED = os.getenv("COMPRESSION_BROTLI_ENABLED", "true").lower() == "true"
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Only these media types are compressed. Server-Sent Events are never
+# compressed: each event has to reach the browser as soon as it is sent.
+COMPRESSION_CONTENT_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "application/javascript",
+    "image/svg+xml",
+})
+
+# ============================================================================
+# PORTAL DATA (served by the data router)
+# ============================================================================
+
+# Directory holding data/ and assets/ (the repo root in development)
+PORTAL_DATA_DIR = Path(os.getenv("PORTAL_DATA_DIR", str(BASE_DIR.parent)))
+
+# name -> file under PORTAL_DATA_DIR, media type, portal types allowed to read it.
+# Customers and partners must also hold a valid NDA (check_nda_access).
+PORTAL_DATA_FILES = {
+    "financial-model": {
+        "path": "data/financial-model.json",
+        "media_type": "application/json",
+        "portal_types": ("founder", "investor", "partner"),
+    },
+    "customers": {
+        "path": "data/customers.json",
+        "media_type": "application/json",
+        # Customer and partner portals get only their own record (/data/customers/mine)
+        "portal_types": ("founder", "investor"),
+    },
+    "pipeline": {
+        "path": "assets/documents/LVS_Customer_Pipeline_Feb2026.csv",
+        "media_type": "text/csv",
+        "portal_types": ("founder", "investor", "partner"),
+    },
+}
+
+# Browsers keep a copy but revalidate every time (a 304 when unchanged)
+PORTAL_DATA_CACHE_CONTROL = "private, no-cache"
+# How long a token's user and NDA status are reused before hitting the database
+PORTAL_DATA_USER_CACHE_SECONDS = 30
+PORTAL_DATA_USER_CACHE_SIZE = 1000
+
+# ============================================================================
+# PIPELINE ANALYTICS
+# ============================================================================
+
+PIPELINE_SIMULATION_DEFAULT_TRIALS = 100_000
+PIPELINE_SIMULATION_MAX_TRIALS = 2_000_000
+PIPELINE_SIMULATION_CHUNK_TRIALS = 100_000  # Trials drawn per array (bounds memory)
+PIPELINE_SIMULATION_SEED = 2026             # Default seed, so results are repeatable and cacheable
+PIPELINE_SIMULATION_CACHE_SIZE = 32         # Distinct (trials, basis, seed) results kept
+
+# ============================================================================
+# METRICS (Prometheus, GET /metrics)
+# ============================================================================
+
+# Scrapers must send "Authorization: Bearer <METRICS_TOKEN>". Without a token
+# /metrics is not served at all, unless METRICS_PUBLIC=true opens it (e.g.
+# when only reachable from a private network)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+
+# ============================================================================
+# REQUEST TIMING (Server-Timing header and access log)
+# ============================================================================
+
+# Per-request query counts and subsystem timings (db, jwt, session, argon2,
+# turso, gcs, email). Off by default; the hooks cost one context lookup when off.
+REQUEST_TIMING_ENABLED = os.getenv("REQUEST_TIMING_ENABLED", "false").lower() == "true"
+# Send the timings to the browser as a Server-Timing response header
+REQUEST_TIMING_HEADER = os.getenv("REQUEST_TIMING_HEADER", "true").lower() == "true"
+# Print one JSON access log line per request
+REQUEST_TIMING_ACCESS_LOG = os.getenv("REQUEST_TIMING_ACCESS_LOG", "true").lower() == "true"
+
+# ============================================================================
+# SLOW QUERY LOG
+# ============================================================================
+
+# Statements slower than this are logged with their EXPLAIN QUERY PLAN (0 disables)
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
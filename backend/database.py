@@ -3,8 +3,10 @@ LVS Portal - Database Setup
 SQLite database with Turso (cloud) or local fallback
 """
 import sqlite3
+import sys
+import time
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Set, Iterator
 from pathlib import Path
 
 from config import (
@@ -12,9 +14,11 @@ from config import (
     DEMO_FOUNDER_PASSWORD, DEMO_INVESTOR_PASSWORD,
     DEMO_CUSTOMER_PASSWORD, DEMO_PARTNER_PASSWORD,
     TURSO_DATABASE_URL, TURSO_AUTH_TOKEN, USE_TURSO,
-    USER_PASSWORD_PREFIX
+    USER_PASSWORD_PREFIX, SLOW_QUERY_THRESHOLD_MS
 )
 from security import hash_password
+from metrics import observe_query, track, TURSO_SYNC_DURATION
+from request_timing import add_connection
 
 # Try to import libsql for Turso support
 try:
@@ -32,6 +36,106 @@ _turso_conn = None
 _using_turso = False
 
 
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times every statement against the function that ran it, and
+    logs statements slower than SLOW_QUERY_THRESHOLD_MS with their query plan.
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(sql, parameters, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._observe(sql, None, start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._observe(sql_script, None, start)
+
+    def _observe(self, sql, parameters, start):
+        seconds = time.perf_counter() - start
+        function = _query_caller()
+        observe_query(function, seconds)
+        if SLOW_QUERY_THRESHOLD_MS and seconds * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+            log_slow_query(self.connection, function, sql, parameters, seconds)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Local SQLite connection whose statements are all timed (see InstrumentedCursor)."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # sqlite3's own shortcuts bypass Cursor.execute, so route them through it
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+_INSTRUMENTATION_CODE = {
+    method.__code__
+    for cls in (InstrumentedCursor, InstrumentedConnection)
+    for method in (cls.execute, cls.executemany, cls.executescript)
+} | {InstrumentedCursor._observe.__code__}
+
+
+def _query_caller() -> str:
+    """Name of the function that issued the current statement."""
+    frame = sys._getframe(1)
+    while frame.f_code in _INSTRUMENTATION_CODE:
+        frame = frame.f_back
+    return frame.f_code.co_name
+
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+def explain_query_plan(conn, sql: str, parameters=None) -> List[str]:
+    """
+    EXPLAIN QUERY PLAN detail lines for one statement, e.g.
+    "SEARCH users USING INDEX idx_users_email (email=?)" or "SCAN audit_log".
+    Without parameters every placeholder is bound to NULL, which doesn't
+    change the plan. Returns [] for statements that aren't queries (DDL,
+    PRAGMA) and raises sqlite3.Error if the statement can't be prepared.
+    """
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    if parameters is None:
+        parameters = [None] * sql.count("?")
+    # A plain cursor, so the EXPLAIN itself isn't timed or logged
+    cursor = conn.cursor(sqlite3.Cursor)
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+    return [row[3] for row in cursor.fetchall()]
+
+
+def log_slow_query(conn, function: str, sql: str, parameters, seconds: float):
+    """Print a slow statement with its plan. Parameter values are never logged."""
+    print(f"Slow query: {seconds * 1000:.1f} ms in {function}: {' '.join(sql.split())}")
+    try:
+        plan = explain_query_plan(conn, sql, parameters)
+    except sqlite3.Error as e:
+        print(f"  plan unavailable: {e}")
+        return
+    for detail in plan:
+        print(f"  plan: {detail}")
+
+
 def to_db_datetime(dt: Optional[datetime]) -> Optional[str]:
     """Convert datetime to ISO string for database storage.
 
@@ -58,14 +162,16 @@ def get_db_connection():
             )
             # Initial sync from remote
             try:
-                _turso_conn.sync()
+                with track(TURSO_SYNC_DURATION, "initial"):
+                    _turso_conn.sync()
             except Exception as e:
                 print(f"Turso sync warning: {e}")
         return _turso_conn
     else:
         # Fallback to local SQLite
         _using_turso = False
-        conn = sqlite3.connect(DB_PATH)
+        conn = sqlite3.connect(DB_PATH, factory=InstrumentedConnection)
+        add_connection()
         conn.row_factory = sqlite3.Row
         return conn
 
@@ -75,7 +181,8 @@ def sync_to_turso():
     global _turso_conn
     if _turso_conn is not None:
         try:
-            _turso_conn.sync()
+            with track(TURSO_SYNC_DURATION, "sync"):
+                _turso_conn.sync()
         except Exception as e:
             print(f"Turso sync error: {e}")
 
@@ -85,7 +192,8 @@ def force_turso_resync():
     global _turso_conn
     if USE_TURSO and LIBSQL_AVAILABLE and _turso_conn is not None:
         try:
-            _turso_conn.sync()
+            with track(TURSO_SYNC_DURATION, "resync"):
+                _turso_conn.sync()
             return True
         except Exception as e:
             print(f"Turso resync error: {e}")
@@ -217,6 +325,7 @@ def init_database():
             reviewed_by INTEGER,
             reviewed_at TIMESTAMP,
             review_notes TEXT,
+            preview_path TEXT,
             FOREIGN KEY (user_id) REFERENCES users(id),
             FOREIGN KEY (reviewed_by) REFERENCES users(id)
         )
@@ -232,10 +341,49 @@ def init_database():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             edited_at TIMESTAMP,
             is_deleted INTEGER DEFAULT 0,
+            deleted_at TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
     """)
 
+    # Per-account comment thread versions (ETags for conditional GETs)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS account_comment_versions (
+            account_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Per-user read position in each account's comment thread
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS comment_read_markers (
+            user_id INTEGER NOT NULL,
+            account_id TEXT NOT NULL,
+            last_seen_comment_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, account_id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+    # Outgoing email queue, drained by the background sender
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            html_content TEXT NOT NULL,
+            text_content TEXT,
+            status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'dead')),
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL,
+            expires_at TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    """)
+
     # Password reset tokens table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS password_reset_tokens (
@@ -254,17 +402,39 @@ def init_database():
 
     # Create indexes
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
+    # Founder console user listing: newest first, optional portal filter and prefix search
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_portal_created ON users(portal_type, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_company ON users(company COLLATE NOCASE)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_name ON users(name COLLATE NOCASE)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_token_jti ON sessions(token_jti)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_login_attempts_email ON login_attempts(email)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_pending_auth_email ON pending_auth(email)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_pending_auth_expires ON pending_auth(expires_at)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_nda_documents_user ON nda_documents(user_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_nda_documents_status ON nda_documents(status)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_account_comments_account ON account_comments(account_id)")
+    # Newest-first document listing (get_all_nda_documents) without a sort
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nda_documents_uploaded ON nda_documents(uploaded_at)")
+    # Keyset pagination index for get_comments; supersedes the old account_id index
+    cursor.execute("DROP INDEX IF EXISTS idx_account_comments_account")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_account_comments_page ON account_comments(account_id, is_deleted, created_at, id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_account_comments_created ON account_comments(created_at)")
+    # Small index of soft-deleted rows for the compaction job
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_account_comments_deleted ON account_comments(id) WHERE is_deleted = 1")
+    # Threads a user has commented in, to invalidate them when the author's profile changes
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_account_comments_user ON account_comments(user_id, account_id)")
+    # Covering index for unread counts: live comments by account in id order
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_account_comments_unread ON account_comments(account_id, id, user_id) WHERE is_deleted = 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_password_reset_token ON password_reset_tokens(token)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_password_reset_email ON password_reset_tokens(email)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_password_reset_expires ON password_reset_tokens(expires_at)")
+    # Per-user reads and updates (revoke all sessions, audit history, superseding reset tokens)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log(user_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_password_reset_user ON password_reset_tokens(user_id) WHERE used = 0")
+    # Used tokens for the cleanup job (the expired ones come from idx_password_reset_expires)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_password_reset_used ON password_reset_tokens(used) WHERE used = 1")
 
     conn.commit()
     close_connection(conn)
@@ -301,6 +471,70 @@ def create_user(
         close_connection(conn)
 
 
+def get_existing_emails(emails: List[str]) -> Set[str]:
+    """Return which of the given emails already have an account, in one query per 500."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    existing: Set[str] = set()
+    lowered = [email.lower() for email in emails]
+    for i in range(0, len(lowered), 500):
+        chunk = lowered[i:i + 500]
+        cursor.execute(
+            f"SELECT email FROM users WHERE email IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        existing.update(row[0] for row in cursor.fetchall())
+
+    close_connection(conn)
+    return existing
+
+
+def create_users_bulk(users: List[Dict[str, Any]], chunk_size: int = 100) -> List[Dict[str, Any]]:
+    """Insert pre-hashed users, chunk_size per transaction.
+
+    Each user dict has email, password_hash, name, portal_type, company and
+    nda_status. A failing row (e.g. an email taken since it was checked)
+    only fails that statement; the rest of its chunk still commits.
+    Returns one result per user: {"email", "id"} or {"email", "error"}.
+    """
+    results: List[Dict[str, Any]] = []
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        for i in range(0, len(users), chunk_size):
+            chunk = users[i:i + chunk_size]
+            chunk_results = []
+            try:
+                for user in chunk:
+                    try:
+                        cursor.execute("""
+                            INSERT INTO users (email, password_hash, name, portal_type, company, nda_status)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(email) DO NOTHING
+                        """, (
+                            user["email"].lower(), user["password_hash"], user["name"],
+                            user["portal_type"], user["company"], user["nda_status"]
+                        ))
+                        if cursor.rowcount > 0:
+                            chunk_results.append({"email": user["email"], "id": cursor.lastrowid})
+                        else:
+                            chunk_results.append({"email": user["email"], "error": "Already exists"})
+                    except Exception as e:
+                        chunk_results.append({"email": user["email"], "error": str(e)})
+                conn.commit()
+            except Exception as e:
+                print(f"Error in bulk user creation: {e}")
+                conn.rollback()
+                chunk_results = [{"email": user["email"], "error": "Creation failed"} for user in chunk]
+            results.extend(chunk_results)
+    finally:
+        close_connection(conn)
+
+    return results
+
+
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     """Get a user by their email address."""
     conn = get_db_connection()
@@ -650,7 +884,7 @@ def create_password_reset_token(
         """, (user_id, email.lower(), token, code, to_db_datetime(expires_at), ip_address))
 
         conn.commit()
-        return {'token': token, 'code': code}
+        return {'token': token, 'code': code, 'expires_at': expires_at}
     except Exception as e:
         print(f"Error creating password reset token: {e}")
         conn.rollback()
@@ -834,7 +1068,8 @@ def check_nda_access(user: Dict[str, Any]) -> Dict[str, Any]:
 
     # Check if NDA is approved
     if nda_status == "approved":
-        # Check if NDA has expired
+        # Check if NDA has expired. Read-only: the scheduled sweep
+        # (sweep_nda_expirations) persists the 'expired' status in bulk.
         expires_date = user.get("nda_expires_date")
         if expires_date:
             try:
@@ -844,8 +1079,6 @@ def check_nda_access(user: Dict[str, Any]) -> Dict[str, Any]:
                     expires_dt = expires_date
 
                 if datetime.utcnow() > expires_dt:
-                    # NDA has expired - update status
-                    update_nda_status(user["id"], "expired")
                     return {
                         "allowed": False,
                         "reason": "NDA has expired. Please contact LVS to renew.",
@@ -897,11 +1130,11 @@ def update_nda_status(
 
     if expires_date:
         update_fields.append("nda_expires_date = ?")
-        params.append(expires_date)
+        params.append(to_db_datetime(expires_date))
 
     if signed_date:
         update_fields.append("nda_signed_date = ?")
-        params.append(signed_date)
+        params.append(to_db_datetime(signed_date))
 
     if notes is not None:
         update_fields.append("nda_notes = ?")
@@ -920,12 +1153,99 @@ def update_nda_status(
     return success
 
 
-def get_all_users_nda_status(portal_types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
-    """Get NDA status for all users (or filtered by portal type)."""
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input matches literally (ESCAPE '\\')."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _user_filters(
+    portal_types: Optional[List[str]] = None,
+    search: Optional[str] = None,
+    cursor_id: Optional[int] = None
+) -> Tuple[str, List[Any]]:
+    """Shared WHERE fragments for user listings (table alias u).
+
+    - search: case-insensitive prefix match on email, name or company.
+      Each branch is a range scan (idx_users_email, idx_users_name,
+      idx_users_company), so SQLite answers the OR with a multi-index union.
+    - cursor_id: keyset position for newest-first paging; only users created
+      before that user (ties broken by id) are returned.
+    """
+    sql = ""
+    params: List[Any] = []
+
+    if portal_types:
+        sql += f" AND u.portal_type IN ({','.join('?' * len(portal_types))})"
+        params.extend(portal_types)
+
+    if search:
+        # Emails are stored lowercase, so a plain range uses the email index
+        prefix = search.lower()
+        like = _escape_like(search) + "%"
+        sql += """
+          AND ((u.email >= ? AND u.email < ?)
+               OR u.name LIKE ? ESCAPE '\\'
+               OR u.company LIKE ? ESCAPE '\\')
+        """
+        params.extend([prefix, prefix + "\U0010ffff", like, like])
+
+    if cursor_id is not None:
+        sql += " AND (u.created_at, u.id) < ((SELECT created_at FROM users WHERE id = ?), ?)"
+        params.extend([cursor_id, cursor_id])
+
+    return sql, params
+
+
+def get_users_page(
+    columns: List[str],
+    portal_type: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor_id: Optional[int] = None,
+    limit: Optional[int] = 100
+) -> List[Dict[str, Any]]:
+    """One page of users, newest first, selecting only the given columns.
+
+    Columns must come from a fixed allowlist (they are interpolated).
+    Pass the last id of a page as cursor_id to get the next one, or
+    limit=None for every match.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = """
+    filters, params = _user_filters([portal_type] if portal_type else None, search, cursor_id)
+    select = ", ".join(f"u.{column}" for column in columns)
+
+    cursor.execute(f"""
+        SELECT {select}
+        FROM users u
+        WHERE 1=1 {filters}
+        ORDER BY u.created_at DESC, u.id DESC
+        LIMIT ?
+    """, (*params, limit if limit is not None else -1))
+
+    rows = cursor.fetchall()
+    result = [row_to_dict(cursor, row) for row in rows]
+    close_connection(conn)
+
+    return result
+
+
+def get_all_users_nda_status(
+    portal_types: Optional[List[str]] = None,
+    search: Optional[str] = None,
+    cursor_id: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Get NDA status for all users (or filtered by portal type).
+
+    Without a limit, returns every match ordered by portal type, company and
+    name. With a limit, returns one newest-first page (see get_users_page).
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    filters, params = _user_filters(portal_types, search, cursor_id)
+    query = f"""
         SELECT u.id, u.email, u.name, u.portal_type, u.company,
                u.nda_status, u.nda_signed_date, u.nda_expires_date,
                u.nda_approved_by, u.nda_approved_at, u.nda_notes,
@@ -933,15 +1253,13 @@ def get_all_users_nda_status(portal_types: Optional[List[str]] = None) -> List[D
                approver.name as approved_by_name
         FROM users u
         LEFT JOIN users approver ON u.nda_approved_by = approver.id
-        WHERE u.is_active = 1
+        WHERE u.is_active = 1 {filters}
     """
 
-    if portal_types:
-        placeholders = ','.join('?' * len(portal_types))
-        query += f" AND u.portal_type IN ({placeholders})"
-        cursor.execute(query + " ORDER BY u.portal_type, u.company, u.name", portal_types)
+    if limit is None:
+        cursor.execute(query + " ORDER BY u.portal_type, u.company, u.name", params)
     else:
-        cursor.execute(query + " ORDER BY u.portal_type, u.company, u.name")
+        cursor.execute(query + " ORDER BY u.created_at DESC, u.id DESC LIMIT ?", (*params, limit))
 
     rows = cursor.fetchall()
     result = [row_to_dict(cursor, row) for row in rows]
@@ -950,6 +1268,118 @@ def get_all_users_nda_status(portal_types: Optional[List[str]] = None) -> List[D
     return result
 
 
+def get_nda_status_summary(portal_types: Optional[List[str]] = None) -> Dict[str, int]:
+    """Count active users per NDA status with a single GROUP BY.
+
+    Approved NDAs already past their expiration date count as expired,
+    even if the expiry sweep hasn't run yet. Covered by idx_users_portal_nda.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    query = """
+        SELECT CASE
+                   WHEN nda_status = 'approved' AND nda_expires_date <= ? THEN 'expired'
+                   ELSE nda_status
+               END AS status,
+               COUNT(*) AS count
+        FROM users
+        WHERE is_active = 1
+    """
+    params: List[Any] = [to_db_datetime(datetime.utcnow())]
+
+    if portal_types:
+        placeholders = ','.join('?' * len(portal_types))
+        query += f" AND portal_type IN ({placeholders})"
+        params.extend(portal_types)
+
+    cursor.execute(query + " GROUP BY status", params)
+
+    summary = {"pending": 0, "approved": 0, "expired": 0, "revoked": 0}
+    for row in cursor.fetchall():
+        status, count = row[0], row[1]
+        if status in summary:
+            summary[status] = count
+    close_connection(conn)
+
+    return summary
+
+
+def expire_overdue_ndas() -> int:
+    """Expire every approved NDA past its expiration date in one UPDATE.
+
+    Uses idx_users_nda_expires. Returns the number of NDAs expired.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE users SET nda_status = 'expired', updated_at = CURRENT_TIMESTAMP
+        WHERE nda_expires_date <= ? AND nda_status = 'approved'
+    """, (to_db_datetime(datetime.utcnow()),))
+
+    conn.commit()
+    expired = cursor.rowcount
+    close_connection(conn)
+    return expired
+
+
+def get_upcoming_nda_expirations(days: int = 30) -> List[Dict[str, Any]]:
+    """Get approved NDAs expiring within the next N days, soonest first."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    now = datetime.utcnow()
+    cursor.execute("""
+        SELECT id, email, name, portal_type, company, nda_expires_date
+        FROM users
+        WHERE nda_expires_date > ? AND nda_expires_date <= ?
+          AND nda_status = 'approved' AND is_active = 1
+        ORDER BY nda_expires_date ASC
+    """, (to_db_datetime(now), to_db_datetime(now + timedelta(days=days))))
+
+    rows = cursor.fetchall()
+    result = [row_to_dict(cursor, row) for row in rows]
+    close_connection(conn)
+    return result
+
+
+def sweep_nda_expirations(warning_days: int = 30) -> Dict[str, Any]:
+    """Expire overdue NDAs and report the ones expiring soon."""
+    return {
+        "expired": expire_overdue_ndas(),
+        "expiring": get_upcoming_nda_expirations(warning_days)
+    }
+
+
+def extend_nda_expirations(user_ids: List[int], expires_date: datetime) -> List[Dict[str, Any]]:
+    """Renew NDAs for several users in one UPDATE.
+
+    Only customer/partner NDAs that are approved or expired are renewed; a
+    bulk extend must never grant access to pending, revoked or unknown users.
+    Returns the id and email of each user renewed.
+    """
+    if not user_ids:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    placeholders = ','.join('?' * len(user_ids))
+    cursor.execute(f"""
+        UPDATE users
+        SET nda_status = 'approved', nda_expires_date = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN ({placeholders}) AND portal_type IN ('customer', 'partner')
+          AND nda_status IN ('approved', 'expired')
+        RETURNING id, email
+    """, [to_db_datetime(expires_date), *user_ids])
+
+    extended = [{"id": row[0], "email": row[1]} for row in cursor.fetchall()]
+    conn.commit()
+    close_connection(conn)
+    return extended
+
+
 def set_user_nda_pending(user_id: int) -> bool:
     """Set a user's NDA status to pending (for new customer/partner users)."""
     return update_nda_status(user_id, "pending")
@@ -1076,6 +1506,58 @@ def get_all_nda_documents(status: Optional[str] = None) -> List[Dict[str, Any]]:
     return result
 
 
+def set_nda_document_preview(doc_id: int, preview_path: str) -> bool:
+    """Record the cached preview for an NDA document.
+
+    An empty preview_path marks the document as having no renderable
+    preview so the review queue does not retry it on every view.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE nda_documents SET preview_path = ?
+        WHERE id = ?
+    """, (preview_path, doc_id))
+
+    conn.commit()
+    success = cursor.rowcount > 0
+    close_connection(conn)
+    return success
+
+
+def reset_unavailable_nda_previews() -> int:
+    """Clear "no preview" markers so those documents are rendered again."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("UPDATE nda_documents SET preview_path = NULL WHERE preview_path = ''")
+
+    conn.commit()
+    count = cursor.rowcount
+    close_connection(conn)
+    return count
+
+
+def get_nda_documents_without_preview(limit: int = 50) -> List[Dict[str, Any]]:
+    """Get NDA documents whose preview has not been generated yet."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT id, gcs_path, content_type
+        FROM nda_documents
+        WHERE preview_path IS NULL
+        ORDER BY uploaded_at ASC
+        LIMIT ?
+    """, (limit,))
+
+    rows = cursor.fetchall()
+    result = [row_to_dict(cursor, row) for row in rows]
+    close_connection(conn)
+    return result
+
+
 def review_nda_document(
     doc_id: int,
     reviewer_id: int,
@@ -1126,6 +1608,51 @@ def review_nda_document(
 # ACCOUNT COMMENTS (Slack-like feature)
 # ============================================================================
 
+def _bump_comment_version(cursor, account_id: str) -> None:
+    """Increment an account's comment thread version (caller commits)."""
+    cursor.execute("""
+        INSERT INTO account_comment_versions (account_id, version) VALUES (?, 1)
+        ON CONFLICT(account_id) DO UPDATE SET version = version + 1
+    """, (account_id,))
+
+
+def bump_comment_versions_for_user(user_id: int) -> int:
+    """Bump the version of every thread a user has commented in.
+
+    Comment responses show the author's name, company and portal type, so
+    cached threads (ETags) must change when any of those do. Returns the
+    number of threads bumped.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        INSERT INTO account_comment_versions (account_id, version)
+        SELECT DISTINCT account_id, 1 FROM account_comments WHERE user_id = ?
+        ON CONFLICT(account_id) DO UPDATE SET version = version + 1
+    """, (user_id,))
+
+    conn.commit()
+    bumped = cursor.rowcount
+    close_connection(conn)
+    return bumped
+
+
+def get_comment_version(account_id: str) -> int:
+    """Get an account's comment thread version (0 if it has never changed)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT version FROM account_comment_versions WHERE account_id = ?",
+        (account_id,)
+    )
+
+    row = cursor.fetchone()
+    close_connection(conn)
+    return row[0] if row else 0
+
+
 def create_comment(
     account_id: str,
     user_id: int,
@@ -1140,8 +1667,10 @@ def create_comment(
             INSERT INTO account_comments (account_id, user_id, message)
             VALUES (?, ?, ?)
         """, (account_id, user_id, message))
+        comment_id = cursor.lastrowid
+        _bump_comment_version(cursor, account_id)
         conn.commit()
-        return cursor.lastrowid
+        return comment_id
     except Exception as e:
         print(f"Error creating comment: {e}")
         return None
@@ -1149,24 +1678,111 @@ def create_comment(
         close_connection(conn)
 
 
-def get_comments(account_id: str, limit: int = 100) -> List[Dict[str, Any]]:
-    """Get comments for an account with user info."""
+def get_comments(
+    account_id: str,
+    limit: int = 100,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    newest_first: bool = False
+) -> List[Dict[str, Any]]:
+    """Get one page of comments for an account with user info.
+
+    Keyset pagination on (created_at, id) using idx_account_comments_page:
+    - default: the newest `limit` comments
+    - before: comments older than comment id `before` (scroll back)
+    - after: comments newer than comment id `after` (catch up)
+    Rows come back oldest-first unless newest_first is set.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute("""
+    query = """
         SELECT c.id, c.account_id, c.message, c.created_at, c.edited_at,
                u.id as user_id, u.name, u.email, u.company, u.portal_type
         FROM account_comments c
         JOIN users u ON c.user_id = u.id
         WHERE c.account_id = ? AND c.is_deleted = 0
-        ORDER BY c.created_at ASC
-        LIMIT ?
-    """, (account_id, limit))
+    """
+    params: List[Any] = [account_id]
+
+    # Cursor ids needn't exist any more (deleted, or 0 for "from the start"):
+    # position them at the nearest surviving comment's timestamp.
+    if after is not None:
+        query += """
+          AND (c.created_at, c.id) > (
+              COALESCE((SELECT created_at FROM account_comments WHERE id <= ? ORDER BY id DESC LIMIT 1), ''),
+              ?)
+        ORDER BY c.created_at ASC, c.id ASC
+        """
+        params.extend([after, after])
+        ascending = True
+    else:
+        if before is not None:
+            query += """
+          AND (c.created_at, c.id) < (
+              COALESCE((SELECT created_at FROM account_comments WHERE id >= ? ORDER BY id ASC LIMIT 1), '9999'),
+              ?)
+            """
+            params.extend([before, before])
+        query += " ORDER BY c.created_at DESC, c.id DESC"
+        ascending = False
+
+    cursor.execute(query + " LIMIT ?", (*params, limit))
 
     rows = cursor.fetchall()
     result = [row_to_dict(cursor, row) for row in rows]
     close_connection(conn)
+
+    if ascending == newest_first:
+        result.reverse()
+    return result
+
+
+def get_comments_for_accounts(
+    account_ids: List[str],
+    per_account: int = 20
+) -> Dict[str, Dict[str, Any]]:
+    """Latest comments and total counts for several accounts in one query.
+
+    A window over idx_account_comments_page ranks each account's comments
+    newest-first; the same window also carries the account's total count.
+    Returns {account_id: {"comments": [...oldest-first], "count": total}}
+    with an empty entry for accounts that have no comments.
+    """
+    result: Dict[str, Dict[str, Any]] = {
+        account_id: {"comments": [], "count": 0} for account_id in account_ids
+    }
+    if not account_ids:
+        return result
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    placeholders = ",".join("?" * len(account_ids))
+    cursor.execute(f"""
+        SELECT r.id, r.account_id, r.message, r.created_at, r.edited_at, r.total,
+               u.id as user_id, u.name, u.email, u.company, u.portal_type
+        FROM (
+            SELECT c.id, c.account_id, c.user_id, c.message, c.created_at, c.edited_at,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY c.account_id ORDER BY c.created_at DESC, c.id DESC
+                   ) as rn,
+                   COUNT(*) OVER (PARTITION BY c.account_id) as total
+            FROM account_comments c
+            WHERE c.account_id IN ({placeholders}) AND c.is_deleted = 0
+        ) r
+        JOIN users u ON r.user_id = u.id
+        WHERE r.rn <= ?
+        ORDER BY r.account_id, r.created_at ASC, r.id ASC
+    """, (*account_ids, per_account))
+
+    for row in cursor.fetchall():
+        comment = row_to_dict(cursor, row)
+        entry = result[comment['account_id']]
+        entry["count"] = comment.pop('total')
+        entry["comments"].append(comment)
+
+    close_connection(conn)
     return result
 
 
@@ -1178,7 +1794,7 @@ def delete_comment(comment_id: int, user_id: int) -> bool:
     try:
         # Check if user owns the comment or is a founder
         cursor.execute("""
-            SELECT c.user_id, u.portal_type
+            SELECT c.user_id, u.portal_type, c.account_id
             FROM account_comments c
             JOIN users u ON u.id = ?
             WHERE c.id = ?
@@ -1190,17 +1806,23 @@ def delete_comment(comment_id: int, user_id: int) -> bool:
 
         comment_owner_id = row[0]
         requester_portal_type = row[1]
+        account_id = row[2]
 
         # Allow if owner or founder
         if comment_owner_id != user_id and requester_portal_type != 'founder':
             return False
 
         cursor.execute("""
-            UPDATE account_comments SET is_deleted = 1 WHERE id = ?
-        """, (comment_id,))
+            UPDATE account_comments SET is_deleted = 1, deleted_at = COALESCE(deleted_at, ?)
+            WHERE id = ?
+        """, (to_db_datetime(datetime.utcnow()), comment_id))
+        deleted = cursor.rowcount > 0
+
+        if deleted:
+            _bump_comment_version(cursor, account_id)
 
         conn.commit()
-        return cursor.rowcount > 0
+        return deleted
     except Exception as e:
         print(f"Error deleting comment: {e}")
         return False
@@ -1208,23 +1830,554 @@ def delete_comment(comment_id: int, user_id: int) -> bool:
         close_connection(conn)
 
 
-def get_user_display_name(user: Dict[str, Any]) -> str:
-    """Get formatted display name: FirstName (Company)."""
-    name = user.get('name', 'Unknown')
-    first_name = name.split()[0] if name else 'Unknown'
-
-    company = user.get('company', '')
-    portal_type = user.get('portal_type', '')
+def compact_deleted_comments(retention_days: int, batch_size: int = 500) -> Dict[str, int]:
+    """Hard-delete soft-deleted comments older than the retention window.
 
-    # LVS employees get (LVS)
-    if portal_type == 'founder' or company == 'lvs':
-        return f"{first_name} (LVS)"
+    Rows go in batches of batch_size, each in its own short transaction, so
+    writers are never blocked for long. Rows deleted before deleted_at
+    existed fall back to created_at. The FTS delete trigger keeps the
+    search index in step. Freed pages are then returned to the filesystem
+    with an incremental vacuum (a no-op unless auto_vacuum is INCREMENTAL).
+    """
+    # created_at is CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS') while deleted_at
+    # is ISO ('T' separator); datetime() normalizes both before comparing
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+    reclaimed = 0
+    batches = 0
 
-    # Others get their company name capitalized
-    if company:
-        return f"{first_name} ({company.upper()})"
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
-    # Fallback to portal type
+    try:
+        while True:
+            cursor.execute("""
+                DELETE FROM account_comments WHERE id IN (
+                    SELECT id FROM account_comments
+                    WHERE is_deleted = 1 AND datetime(COALESCE(deleted_at, created_at)) < ?
+                    LIMIT ?
+                )
+            """, (cutoff, batch_size))
+            deleted = cursor.rowcount
+            conn.commit()
+
+            if deleted <= 0:
+                break
+            reclaimed += deleted
+            batches += 1
+            if deleted < batch_size:
+                break
+
+        freed_pages = 0
+        if reclaimed:
+            try:
+                cursor.execute("PRAGMA freelist_count")
+                free_before = cursor.fetchone()[0]
+                # executescript steps the pragma to completion; a plain
+                # execute() frees only one page
+                cursor.executescript("PRAGMA incremental_vacuum")
+                cursor.execute("PRAGMA freelist_count")
+                freed_pages = free_before - cursor.fetchone()[0]
+            except Exception as e:
+                print(f"Incremental vacuum skipped: {e}")
+
+        return {"reclaimed": reclaimed, "batches": batches, "freed_pages": freed_pages}
+    finally:
+        close_connection(conn)
+
+
+# ============================================================================
+# EMAIL OUTBOX
+# ============================================================================
+
+def enqueue_email(
+    to_email: str,
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None,
+    expires_at: Optional[datetime] = None
+) -> Optional[int]:
+    """Queue an email for the background sender. Returns the outbox id.
+
+    An email still undelivered at expires_at is dead-lettered instead of sent.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            INSERT INTO email_outbox (to_email, subject, html_content, text_content, next_attempt_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            to_email, subject, html_content, text_content,
+            to_db_datetime(datetime.utcnow()), to_db_datetime(expires_at)
+        ))
+        outbox_id = cursor.lastrowid
+        conn.commit()
+        return outbox_id
+    except Exception as e:
+        print(f"Error queueing email: {e}")
+        return None
+    finally:
+        close_connection(conn)
+
+
+def claim_outbox_emails(limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+    """Claim up to `limit` due emails for sending, oldest first.
+
+    Claimed rows move to 'sending' with next_attempt_at pushed out by the
+    lease, so a sender that dies mid-batch leaves them to be retried once
+    the lease runs out. The claim counts as an attempt.
+    """
+    now = datetime.utcnow()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            UPDATE email_outbox
+            SET status = 'sending', attempts = attempts + 1, next_attempt_at = ?
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                ORDER BY next_attempt_at
+                LIMIT ?
+            )
+            RETURNING id, to_email, subject, html_content, text_content, attempts, expires_at
+        """, (
+            to_db_datetime(now + timedelta(seconds=lease_seconds)),
+            to_db_datetime(now),
+            limit
+        ))
+        emails = [row_to_dict(cursor, row) for row in cursor.fetchall()]
+        conn.commit()
+        return sorted(emails, key=lambda e: e['id'])
+    finally:
+        close_connection(conn)
+
+
+def mark_emails_sent(outbox_ids: List[int]) -> None:
+    """Mark delivered emails as sent and drop their bodies."""
+    if not outbox_ids:
+        return
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    placeholders = ",".join("?" * len(outbox_ids))
+    cursor.execute(f"""
+        UPDATE email_outbox
+        SET status = 'sent', sent_at = ?, last_error = NULL,
+            html_content = '', text_content = NULL
+        WHERE id IN ({placeholders})
+    """, (to_db_datetime(datetime.utcnow()), *outbox_ids))
+
+    conn.commit()
+    close_connection(conn)
+
+
+def mark_email_failed(outbox_id: int, error: str, retry_at: Optional[datetime] = None) -> None:
+    """Record a failed attempt: retry at retry_at, or dead-letter if None."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    if retry_at is not None:
+        cursor.execute("""
+            UPDATE email_outbox SET status = 'pending', next_attempt_at = ?, last_error = ?
+            WHERE id = ?
+        """, (to_db_datetime(retry_at), error[:500], outbox_id))
+    else:
+        cursor.execute("""
+            UPDATE email_outbox SET status = 'dead', last_error = ?
+            WHERE id = ?
+        """, (error[:500], outbox_id))
+
+    conn.commit()
+    close_connection(conn)
+
+
+def get_email_outbox_stats() -> Dict[str, Any]:
+    """Outbox counts by status, plus the most recent dead letters."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT status, COUNT(*) FROM email_outbox GROUP BY status")
+    counts = {status: 0 for status in ('pending', 'sending', 'sent', 'dead')}
+    counts.update({row[0]: row[1] for row in cursor.fetchall()})
+
+    cursor.execute("""
+        SELECT id, to_email, subject, attempts, last_error, created_at
+        FROM email_outbox WHERE status = 'dead'
+        ORDER BY id DESC LIMIT 20
+    """)
+    dead = [row_to_dict(cursor, row) for row in cursor.fetchall()]
+
+    close_connection(conn)
+    return {"counts": counts, "dead_letters": dead}
+
+
+def requeue_dead_emails(outbox_ids: Optional[List[int]] = None) -> int:
+    """Move dead-lettered emails back to pending (all of them if no ids given).
+
+    Expired emails stay dead: their links and codes no longer work.
+    """
+    now = to_db_datetime(datetime.utcnow())
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    query = """
+        UPDATE email_outbox SET status = 'pending', attempts = 0, next_attempt_at = ?
+        WHERE status = 'dead' AND (expires_at IS NULL OR expires_at > ?)
+    """
+    params: List[Any] = [now, now]
+    if outbox_ids:
+        query += f" AND id IN ({','.join('?' * len(outbox_ids))})"
+        params.extend(outbox_ids)
+
+    cursor.execute(query, params)
+    requeued = cursor.rowcount
+    conn.commit()
+    close_connection(conn)
+    return requeued
+
+
+def purge_email_outbox(retention_days: int) -> int:
+    """Delete sent emails, and expired dead letters, older than the retention window."""
+    cutoff = to_db_datetime(datetime.utcnow() - timedelta(days=retention_days))
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        DELETE FROM email_outbox WHERE status = 'sent' AND sent_at < ?
+    """, (cutoff,))
+    purged = cursor.rowcount
+    cursor.execute("""
+        DELETE FROM email_outbox WHERE status = 'dead' AND expires_at < ?
+    """, (cutoff,))
+    purged += cursor.rowcount
+
+    conn.commit()
+    close_connection(conn)
+    return purged
+
+
+# ============================================================================
+# EXPORTS
+# ============================================================================
+
+def _iter_by_id(query: str, params: List[Any], id_column: str, batch_size: int) -> Iterator[Dict[str, Any]]:
+    """Yield the rows of `query` in id order, fetching batch_size at a time.
+
+    query must end inside a WHERE clause. Every batch is its own short
+    statement (keyset on id_column), so no read lock or connection is held
+    while the caller is busy with the rows - e.g. a slow download.
+    """
+    last_id = 0
+    while True:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"{query} AND {id_column} > ? ORDER BY {id_column} LIMIT ?",
+            (*params, last_id, batch_size)
+        )
+        rows = [row_to_dict(cursor, row) for row in cursor.fetchall()]
+        close_connection(conn)
+
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def iter_users_for_export(batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """All users without credentials, in id order."""
+    return _iter_by_id("""
+        SELECT id, email, name, portal_type, company, is_active,
+               totp_enabled, nda_status, created_at, last_login
+        FROM users
+        WHERE 1=1
+    """, [], "id", batch_size)
+
+
+def iter_audit_log_for_export(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    action: Optional[str] = None,
+    batch_size: int = 500
+) -> Iterator[Dict[str, Any]]:
+    """Audit log entries with the acting user's email, oldest first."""
+    query = """
+        SELECT a.id, a.timestamp, a.user_id, u.email as user_email,
+               a.action, a.details, a.ip_address
+        FROM audit_log a
+        LEFT JOIN users u ON a.user_id = u.id
+        WHERE 1=1
+    """
+    params: List[Any] = []
+
+    # Audit timestamps are CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS')
+    if since:
+        query += " AND a.timestamp >= ?"
+        params.append(since.strftime("%Y-%m-%d %H:%M:%S"))
+    if until:
+        query += " AND a.timestamp < ?"
+        params.append(until.strftime("%Y-%m-%d %H:%M:%S"))
+    if action:
+        query += " AND a.action = ?"
+        params.append(action)
+
+    return _iter_by_id(query, params, "a.id", batch_size)
+
+
+def iter_nda_records_for_export(
+    portal_types: Optional[List[str]] = None,
+    batch_size: int = 500
+) -> Iterator[Dict[str, Any]]:
+    """NDA state of every user (optionally by portal type), in id order."""
+    query = """
+        SELECT u.id, u.email, u.name, u.portal_type, u.company, u.is_active,
+               u.nda_status, u.nda_signed_date, u.nda_expires_date,
+               u.nda_approved_at, approver.email as nda_approved_by,
+               u.nda_notes
+        FROM users u
+        LEFT JOIN users approver ON u.nda_approved_by = approver.id
+        WHERE 1=1
+    """
+    params: List[Any] = []
+
+    if portal_types:
+        query += f" AND u.portal_type IN ({','.join('?' * len(portal_types))})"
+        params.extend(portal_types)
+
+    return _iter_by_id(query, params, "u.id", batch_size)
+
+
+# ============================================================================
+# COMMENT READ MARKERS
+# ============================================================================
+
+def mark_comments_read(user_id: int, account_id: str, comment_id: Optional[int] = None) -> int:
+    """Move a user's read marker for an account forward.
+
+    Comment ids only grow, so "read up to id N" is the whole state.
+    Without comment_id the marker moves to the account's latest comment.
+    Markers never move backwards. Returns the stored marker.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        if comment_id is None:
+            cursor.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM account_comments WHERE account_id = ?",
+                (account_id,)
+            )
+            comment_id = cursor.fetchone()[0]
+
+        cursor.execute("""
+            INSERT INTO comment_read_markers (user_id, account_id, last_seen_comment_id, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, account_id) DO UPDATE SET
+                last_seen_comment_id = MAX(last_seen_comment_id, excluded.last_seen_comment_id),
+                updated_at = excluded.updated_at
+        """, (user_id, account_id, comment_id, to_db_datetime(datetime.utcnow())))
+
+        cursor.execute("""
+            SELECT last_seen_comment_id FROM comment_read_markers
+            WHERE user_id = ? AND account_id = ?
+        """, (user_id, account_id))
+        marker = cursor.fetchone()[0]
+
+        conn.commit()
+        return marker
+    finally:
+        close_connection(conn)
+
+
+def get_unread_comment_counts(user_id: int, cap: int = 100) -> Dict[str, int]:
+    """Unread comment counts per account for one user, in one query.
+
+    Counts live comments newer than the user's read marker (all of them if
+    the user has never opened the thread), excluding the user's own, up to
+    cap per account. Accounts with nothing unread are omitted.
+
+    The accounts are enumerated with one idx_account_comments_unread seek
+    each (a recursive skip-scan), and each count is a range read after the
+    account's marker that stops at cap. The cost grows with the number of
+    accounts and unread comments, not with the size of the comment history.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        WITH RECURSIVE accounts(account_id) AS (
+            SELECT MIN(account_id) FROM account_comments WHERE is_deleted = 0
+            UNION ALL
+            SELECT (
+                SELECT MIN(c.account_id) FROM account_comments c
+                WHERE c.is_deleted = 0 AND c.account_id > accounts.account_id
+            )
+            FROM accounts
+            WHERE accounts.account_id IS NOT NULL
+        )
+        SELECT a.account_id, (
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM account_comments c
+                WHERE c.account_id = a.account_id
+                  AND c.is_deleted = 0
+                  AND c.id > COALESCE(m.last_seen_comment_id, 0)
+                  AND c.user_id != ?
+                LIMIT ?
+            )
+        ) as unread
+        FROM accounts a
+        LEFT JOIN comment_read_markers m
+               ON m.user_id = ? AND m.account_id = a.account_id
+        WHERE a.account_id IS NOT NULL
+    """, (user_id, cap, user_id))
+
+    counts = {row[0]: row[1] for row in cursor.fetchall() if row[1]}
+    close_connection(conn)
+    return counts
+
+
+# ============================================================================
+# COMMENT SEARCH (SQLite FTS5)
+# ============================================================================
+
+def init_comment_search() -> bool:
+    """Create the FTS5 index over account_comments and its sync triggers.
+
+    External-content table: the index stores only terms, account_comments
+    keeps the text. Triggers mirror inserts, edits and hard deletes;
+    soft-deleted comments stay indexed and are filtered at query time.
+    Returns False if this SQLite build has no FTS5.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name = 'account_comments_fts'
+        """)
+        is_new = cursor.fetchone() is None
+
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS account_comments_fts USING fts5(
+                message,
+                content='account_comments',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS account_comments_fts_insert
+            AFTER INSERT ON account_comments BEGIN
+                INSERT INTO account_comments_fts (rowid, message) VALUES (new.id, new.message);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS account_comments_fts_delete
+            AFTER DELETE ON account_comments BEGIN
+                INSERT INTO account_comments_fts (account_comments_fts, rowid, message)
+                VALUES ('delete', old.id, old.message);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS account_comments_fts_update
+            AFTER UPDATE OF message ON account_comments BEGIN
+                INSERT INTO account_comments_fts (account_comments_fts, rowid, message)
+                VALUES ('delete', old.id, old.message);
+                INSERT INTO account_comments_fts (rowid, message) VALUES (new.id, new.message);
+            END
+        """)
+
+        # Index comments written before the search table existed
+        if is_new:
+            cursor.execute("INSERT INTO account_comments_fts (account_comments_fts) VALUES ('rebuild')")
+
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Warning: comment search unavailable: {e}")
+        return False
+    finally:
+        close_connection(conn)
+
+
+def rebuild_comment_search_index() -> int:
+    """Rebuild the comment search index from account_comments.
+
+    Returns the number of comments indexed.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("INSERT INTO account_comments_fts (account_comments_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO account_comments_fts (account_comments_fts) VALUES ('optimize')")
+    cursor.execute("SELECT COUNT(*) FROM account_comments")
+    indexed = cursor.fetchone()[0]
+
+    conn.commit()
+    close_connection(conn)
+    return indexed
+
+
+def search_comments(
+    fts_query: str,
+    account_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Full-text search over live comments, best matches first (bm25).
+
+    fts_query must already be a valid FTS5 MATCH expression. Each row has a
+    `snippet` with matches wrapped in char(2) ... char(3) markers.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    query = """
+        SELECT c.id, c.account_id, c.message, c.created_at, c.edited_at,
+               u.id as user_id, u.name, u.email, u.company, u.portal_type,
+               snippet(account_comments_fts, 0, char(2), char(3), '...', 16) as snippet
+        FROM account_comments_fts
+        JOIN account_comments c ON c.id = account_comments_fts.rowid
+        JOIN users u ON c.user_id = u.id
+        WHERE account_comments_fts MATCH ? AND c.is_deleted = 0
+    """
+    params: List[Any] = [fts_query]
+
+    if account_id:
+        query += " AND c.account_id = ?"
+        params.append(account_id)
+
+    cursor.execute(query + " ORDER BY account_comments_fts.rank LIMIT ? OFFSET ?", (*params, limit, offset))
+
+    rows = cursor.fetchall()
+    result = [row_to_dict(cursor, row) for row in rows]
+    close_connection(conn)
+    return result
+
+
+def get_user_display_name(user: Dict[str, Any]) -> str:
+    """Get formatted display name: FirstName (Company)."""
+    name = user.get('name', 'Unknown')
+    first_name = name.split()[0] if name else 'Unknown'
+
+    company = user.get('company', '')
+    portal_type = user.get('portal_type', '')
+
+    # LVS employees get (LVS)
+    if portal_type == 'founder' or company == 'lvs':
+        return f"{first_name} (LVS)"
+
+    # Others get their company name capitalized
+    if company:
+        return f"{first_name} ({company.upper()})"
+
+    # Fallback to portal type
     if portal_type:
         return f"{first_name} ({portal_type.capitalize()})"
 
@@ -1235,6 +2388,20 @@ def get_user_display_name(user: Dict[str, Any]) -> str:
 # SEED DATA
 # ============================================================================
 
+def migrate_database():
+    """Bring an existing database up to the current schema, in order.
+
+    Runs after init_database(): indexes on migrated columns are created by
+    the migration that adds the column.
+    """
+    migrate_add_nda_columns()
+    migrate_add_nda_preview_column()
+    migrate_normalize_nda_dates()
+    migrate_add_comment_deleted_at()
+    migrate_add_email_outbox_expiry()
+    migrate_enable_incremental_vacuum()
+
+
 def migrate_add_nda_columns():
     """Add NDA columns to existing database if they don't exist."""
     conn = get_db_connection()
@@ -1266,6 +2433,112 @@ def migrate_add_nda_columns():
         conn.commit()
         print("Migration complete: NDA columns added.")
 
+    # Indexes on the NDA columns, created here because older databases only
+    # gain those columns above (init_database runs first)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_nda_expires ON users(nda_expires_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_portal_nda ON users(portal_type, is_active, nda_status, nda_expires_date)")
+    conn.commit()
+
+    close_connection(conn)
+
+
+def migrate_normalize_nda_dates():
+    """Store NDA dates as ISO 'T'-separated strings.
+
+    Older rows were written with Python's default sqlite3 datetime adapter
+    (space separator), which doesn't compare correctly against the ISO
+    strings the expiry sweep uses.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE users
+        SET nda_expires_date = replace(nda_expires_date, ' ', 'T'),
+            nda_signed_date = replace(nda_signed_date, ' ', 'T')
+        WHERE nda_expires_date LIKE '____-__-__ %' OR nda_signed_date LIKE '____-__-__ %'
+    """)
+
+    if cursor.rowcount:
+        print(f"Migration complete: normalized NDA dates for {cursor.rowcount} users.")
+    conn.commit()
+    close_connection(conn)
+
+
+def migrate_add_nda_preview_column():
+    """Add the preview_path column to nda_documents if it doesn't exist."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(nda_documents)")
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if "preview_path" not in columns:
+        print("Migrating database: Adding NDA preview column...")
+        cursor.execute("ALTER TABLE nda_documents ADD COLUMN preview_path TEXT")
+        conn.commit()
+        print("Migration complete: NDA preview column added.")
+
+    # Documents still waiting for a preview, oldest first (needs the column above)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nda_documents_no_preview ON nda_documents(uploaded_at) WHERE preview_path IS NULL")
+    conn.commit()
+
+    close_connection(conn)
+
+
+def migrate_add_comment_deleted_at():
+    """Add the deleted_at column to account_comments if it doesn't exist."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(account_comments)")
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if "deleted_at" not in columns:
+        print("Migrating database: Adding comment deleted_at column...")
+        cursor.execute("ALTER TABLE account_comments ADD COLUMN deleted_at TIMESTAMP")
+        conn.commit()
+        print("Migration complete: comment deleted_at column added.")
+
+    close_connection(conn)
+
+
+def migrate_add_email_outbox_expiry():
+    """Add the expires_at column to email_outbox if it doesn't exist."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(email_outbox)")
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if "expires_at" not in columns:
+        print("Migrating database: Adding email outbox expires_at column...")
+        cursor.execute("ALTER TABLE email_outbox ADD COLUMN expires_at TIMESTAMP")
+        conn.commit()
+        print("Migration complete: email outbox expires_at column added.")
+
+    close_connection(conn)
+
+
+def migrate_enable_incremental_vacuum():
+    """Switch the local database to auto_vacuum=INCREMENTAL.
+
+    Existing files need one full VACUUM for the mode change to apply.
+    Skipped for the Turso embedded replica, whose file is managed by libsql.
+    """
+    conn = get_db_connection()
+    if _using_turso:
+        close_connection(conn)
+        return
+
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA auto_vacuum")
+    if cursor.fetchone()[0] != 2:
+        print("Migrating database: Enabling incremental vacuum...")
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+        print("Migration complete: incremental vacuum enabled.")
+
     close_connection(conn)
 
 
@@ -1474,6 +2747,7 @@ def seed_production_users():
                 )
                 conn.commit()
                 close_connection(conn)
+                bump_comment_versions_for_user(existing["id"])
                 if user_data.get("nda_status"):
                     update_nda_status(existing["id"], user_data["nda_status"])
                 updated_count += 1
@@ -1510,6 +2784,9 @@ def seed_production_users():
 if __name__ == "__main__":
     print("Initializing database...")
     init_database()
+    migrate_database()
+    if init_comment_search():
+        print(f"Rebuilt comment search index ({rebuild_comment_search_index()} comments)")
     print("Cleaning up expired pending auth...")
     deleted = cleanup_expired_pending_auth()
     if deleted:
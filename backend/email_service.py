@@ -1,31 +1,153 @@
 """
 LVS Portal - Email Service
-SendGrid integration for transactional emails (password reset, etc.)
+Transactional emails (password reset, etc.) queued in the email outbox and
+delivered in the background through SendGrid
 """
-import os
-from typing import Optional
+import html
+import json
+import string
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+import requests
 
 from config import (
     SENDGRID_API_KEY,
+    SENDGRID_API_URL,
     SENDGRID_FROM_EMAIL,
     SENDGRID_FROM_NAME,
-    PORTAL_URL
+    PORTAL_URL,
+    EMAIL_TRANSPORT,
+    EMAIL_FILE_SINK_PATH,
+    EMAIL_OUTBOX_BATCH_SIZE,
+    EMAIL_OUTBOX_MAX_ATTEMPTS,
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS,
+    EMAIL_OUTBOX_RETRY_MAX_SECONDS,
+    EMAIL_OUTBOX_LEASE_SECONDS
+)
+from database import (
+    enqueue_email, claim_outbox_emails, mark_emails_sent, mark_email_failed, to_db_datetime
 )
+from metrics import track, EMAIL_SEND_DURATION, EMAIL_DELIVERIES
+
+
+# ============================================================================
+# TRANSPORTS
+# ============================================================================
 
-# Try to import SendGrid
-try:
-    from sendgrid import SendGridAPIClient
-    from sendgrid.helpers.mail import Mail, Email, To, Content, HtmlContent
-    SENDGRID_AVAILABLE = True
-except ImportError:
-    SENDGRID_AVAILABLE = False
-    print("Warning: sendgrid not installed. Email functionality disabled.")
+class EmailDeliveryError(Exception):
+    """A message could not be delivered. Permanent errors are not retried."""
+
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class SendGridTransport:
+    """
+    Deliver through the SendGrid v3 mail/send API.
+    One requests.Session is shared by every send, so the pooled HTTPS
+    connection (and its TLS handshake) is reused between messages.
+    """
+
+    def __init__(self, api_key: Optional[str], api_url: str = SENDGRID_API_URL):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+        # Resolve proxy settings once instead of re-reading the environment
+        # (and ~/.netrc) on every request
+        self.session.proxies = requests.utils.get_environ_proxies(api_url)
+        self.session.trust_env = False
+        self._sender = {"email": SENDGRID_FROM_EMAIL, "name": SENDGRID_FROM_NAME}
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def send(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None
+    ) -> None:
+        content = [{"type": "text/html", "value": html_content}]
+        if text_content:
+            # SendGrid requires text/plain before text/html
+            content.insert(0, {"type": "text/plain", "value": text_content})
+
+        payload = {
+            "personalizations": [{"to": [{"email": to_email}]}],
+            "from": self._sender,
+            "subject": subject,
+            "content": content
+        }
+
+        try:
+            response = self.session.post(self.api_url, json=payload, timeout=(5, 30))
+        except requests.RequestException as e:
+            raise EmailDeliveryError(f"SendGrid request failed: {e}")
+
+        if response.status_code not in (200, 201, 202):
+            # A 4xx other than rate limiting won't succeed on retry
+            permanent = 400 <= response.status_code < 500 and response.status_code != 429
+            raise EmailDeliveryError(
+                f"SendGrid returned {response.status_code}: {response.text[:200]}",
+                permanent=permanent
+            )
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class FileSinkTransport:
+    """Append messages as JSON lines to a local file instead of sending them."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def is_configured(self) -> bool:
+        return True
+
+    def send(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None
+    ) -> None:
+        record = {
+            "to": to_email,
+            "from": SENDGRID_FROM_EMAIL,
+            "subject": subject,
+            "html": html_content,
+            "text": text_content,
+            "sent_at": datetime.utcnow().isoformat()
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if EMAIL_TRANSPORT == "file":
+    transport = FileSinkTransport(EMAIL_FILE_SINK_PATH)
+else:
+    transport = SendGridTransport(SENDGRID_API_KEY)
 
 
 def is_email_configured() -> bool:
     """Check if email service is properly configured."""
-    return bool(SENDGRID_AVAILABLE and SENDGRID_API_KEY)
+    return transport.is_configured()
+
 
+# ============================================================================
+# SENDING
+# ============================================================================
 
 def send_email(
     to_email: str,
@@ -33,13 +155,9 @@ def send_email(
     html_content: str,
     text_content: Optional[str] = None
 ) -> bool:
-    """Send an email using SendGrid.
+    """Send an email immediately, bypassing the outbox.
 
-    Args:
-        to_email: Recipient email address
-        subject: Email subject line
-        html_content: HTML body of the email
-        text_content: Plain text fallback (optional)
+    Blocks on the provider; request handlers should use queue_email.
 
     Returns:
         True if email sent successfully, False otherwise
@@ -49,56 +167,131 @@ def send_email(
         return False
 
     try:
-        message = Mail(
-            from_email=Email(SENDGRID_FROM_EMAIL, SENDGRID_FROM_NAME),
-            to_emails=To(to_email),
-            subject=subject,
-            html_content=html_content
-        )
-
-        if text_content:
-            message.content = [
-                Content("text/plain", text_content),
-                Content("text/html", html_content)
-            ]
-
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-
-        if response.status_code in (200, 201, 202):
-            print(f"Email sent successfully to {to_email}")
-            return True
-        else:
-            print(f"Email send failed: {response.status_code} - {response.body}")
-            return False
-
+        with track(EMAIL_SEND_DURATION):
+            transport.send(to_email, subject, html_content, text_content)
+        EMAIL_DELIVERIES.labels("sent").inc()
+        print(f"Email sent successfully to {to_email}")
+        return True
     except Exception as e:
+        EMAIL_DELIVERIES.labels("failed").inc()
         print(f"Email send error: {e}")
         return False
 
 
-def send_password_reset_email(
+def queue_email(
     to_email: str,
-    user_name: str,
-    reset_token: str,
-    reset_code: str
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None,
+    expires_at: Optional[datetime] = None
 ) -> bool:
-    """Send a password reset email with both link and code.
+    """Queue an email in the outbox for background delivery.
 
     Args:
-        to_email: User's email address
-        user_name: User's display name
-        reset_token: Secure URL token for reset link
-        reset_code: 6-digit verification code
+        to_email: Recipient email address
+        subject: Email subject line
+        html_content: HTML body of the email
+        text_content: Plain text fallback (optional)
+        expires_at: Dead-letter instead of sending after this (optional)
 
     Returns:
-        True if email sent successfully, False otherwise
+        True if email was queued, False otherwise
     """
-    reset_url = f"{PORTAL_URL}/login.html?reset_token={reset_token}"
+    if not is_email_configured():
+        print(f"Email not configured. Would send to: {to_email}, Subject: {subject}")
+        return False
+
+    return enqueue_email(to_email, subject, html_content, text_content, expires_at) is not None
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the given number of failed attempts."""
+    seconds = EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, EMAIL_OUTBOX_RETRY_MAX_SECONDS))
 
-    subject = "Reset Your LVS Portal Password"
 
-    html_content = f"""
+def process_email_outbox(batch_size: int = EMAIL_OUTBOX_BATCH_SIZE) -> Dict[str, int]:
+    """Deliver due outbox emails in batches until none are left.
+
+    Failures are retried with exponential backoff; permanent failures and
+    messages out of attempts are dead-lettered for a founder to review, as
+    are messages that reach their expiry before they could be sent.
+    """
+    result = {"sent": 0, "retrying": 0, "dead": 0}
+    if not is_email_configured():
+        return result
+
+    while True:
+        batch = claim_outbox_emails(batch_size, EMAIL_OUTBOX_LEASE_SECONDS)
+        sent_ids = []
+
+        for email in batch:
+            if email['expires_at'] and email['expires_at'] <= to_db_datetime(datetime.utcnow()):
+                mark_email_failed(email['id'], "Expired before delivery")
+                result["dead"] += 1
+                EMAIL_DELIVERIES.labels("dead").inc()
+                continue
+            try:
+                with track(EMAIL_SEND_DURATION):
+                    transport.send(
+                        email['to_email'], email['subject'],
+                        email['html_content'], email['text_content']
+                    )
+                sent_ids.append(email['id'])
+            except Exception as e:
+                permanent = isinstance(e, EmailDeliveryError) and e.permanent
+                if permanent or email['attempts'] >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    mark_email_failed(email['id'], str(e))
+                    result["dead"] += 1
+                    EMAIL_DELIVERIES.labels("dead").inc()
+                    print(f"Email {email['id']} to {email['to_email']} dead-lettered: {e}")
+                else:
+                    mark_email_failed(email['id'], str(e), datetime.utcnow() + retry_delay(email['attempts']))
+                    result["retrying"] += 1
+                    EMAIL_DELIVERIES.labels("retrying").inc()
+
+        mark_emails_sent(sent_ids)
+        result["sent"] += len(sent_ids)
+        EMAIL_DELIVERIES.labels("sent").inc(len(sent_ids))
+
+        if len(batch) < batch_size:
+            return result
+
+
+# ============================================================================
+# TEMPLATES
+# ============================================================================
+
+class EmailTemplate:
+    """
+    A template split once, at import, into static fragments and {field} slots.
+    Rendering just joins the cached fragments with the substituted values.
+    HTML templates escape substituted values, except fields listed in
+    safe_fields, which carry already-rendered HTML.
+    """
+
+    def __init__(self, source: str, escape_html: bool = False, safe_fields: Tuple[str, ...] = ()):
+        self.fragments: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in string.Formatter().parse(source)
+        ]
+        self.escape_html = escape_html
+        self.safe_fields = frozenset(safe_fields)
+
+    def render(self, **values: str) -> str:
+        parts = []
+        for literal, field in self.fragments:
+            parts.append(literal)
+            if field is not None:
+                value = str(values[field])
+                if self.escape_html and field not in self.safe_fields:
+                    value = html.escape(value)
+                parts.append(value)
+        return "".join(parts)
+
+
+PASSWORD_RESET_SUBJECT = "Reset Your LVS Portal Password"
+
+PASSWORD_RESET_HTML = EmailTemplate("""
 <!DOCTYPE html>
 <html>
 <head>
@@ -170,9 +363,9 @@ def send_password_reset_email(
     </div>
 </body>
 </html>
-"""
+""", escape_html=True)
 
-    text_content = f"""
+PASSWORD_RESET_TEXT = EmailTemplate("""
 LOLA VISION SYSTEMS - Password Reset
 
 Hi {user_name},
@@ -190,31 +383,16 @@ If you didn't request this, you can safely ignore this email.
 
 ---
 Lola Vision Systems | Confidential
-"""
-
-    return send_email(to_email, subject, html_content, text_content)
+""")
 
+PASSWORD_CHANGED_SUBJECT = "Your LVS Portal Password Was Changed"
 
-def send_password_changed_notification(
-    to_email: str,
-    user_name: str,
-    ip_address: Optional[str] = None
-) -> bool:
-    """Send a notification that the password was changed.
-
-    Args:
-        to_email: User's email address
-        user_name: User's display name
-        ip_address: IP address where the change was made (optional)
-
-    Returns:
-        True if email sent successfully, False otherwise
-    """
-    subject = "Your LVS Portal Password Was Changed"
-
-    ip_info = f"<p style='color: #888; font-size: 13px; margin: 8px 0 0 0;'>IP Address: {ip_address}</p>" if ip_address else ""
+PASSWORD_CHANGED_IP_HTML = EmailTemplate(
+    "<p style='color: #888; font-size: 13px; margin: 8px 0 0 0;'>IP Address: {ip_address}</p>",
+    escape_html=True
+)
 
-    html_content = f"""
+PASSWORD_CHANGED_HTML = EmailTemplate("""
 <!DOCTYPE html>
 <html>
 <head>
@@ -266,9 +444,9 @@ def send_password_changed_notification(
     </div>
 </body>
 </html>
-"""
+""", escape_html=True, safe_fields=("ip_info",))
 
-    text_content = f"""
+PASSWORD_CHANGED_TEXT = EmailTemplate("""
 LOLA VISION SYSTEMS - Security Notification
 
 Hi {user_name},
@@ -279,6 +457,74 @@ If you didn't make this change, please contact us immediately at security@lolavi
 
 ---
 Lola Vision Systems | Confidential
-"""
+""")
+
+
+def render_password_reset_email(
+    user_name: str,
+    reset_token: str,
+    reset_code: str
+) -> Tuple[str, str, str]:
+    """Render the password reset email. Returns (subject, html, text)."""
+    reset_url = f"{PORTAL_URL}/login.html?reset_token={reset_token}"
+    values = {"user_name": user_name, "reset_code": reset_code, "reset_url": reset_url}
+    return (
+        PASSWORD_RESET_SUBJECT,
+        PASSWORD_RESET_HTML.render(**values),
+        PASSWORD_RESET_TEXT.render(**values)
+    )
+
 
-    return send_email(to_email, subject, html_content, text_content)
+def render_password_changed_email(
+    user_name: str,
+    ip_address: Optional[str] = None
+) -> Tuple[str, str, str]:
+    """Render the password changed notification. Returns (subject, html, text)."""
+    ip_info = PASSWORD_CHANGED_IP_HTML.render(ip_address=ip_address) if ip_address else ""
+    return (
+        PASSWORD_CHANGED_SUBJECT,
+        PASSWORD_CHANGED_HTML.render(user_name=user_name, ip_info=ip_info),
+        PASSWORD_CHANGED_TEXT.render(user_name=user_name)
+    )
+
+
+def send_password_reset_email(
+    to_email: str,
+    user_name: str,
+    reset_token: str,
+    reset_code: str,
+    expires_at: Optional[datetime] = None
+) -> bool:
+    """Queue a password reset email with both link and code.
+
+    Args:
+        to_email: User's email address
+        user_name: User's display name
+        reset_token: Secure URL token for reset link
+        reset_code: 6-digit verification code
+        expires_at: When the token expires; the email is not sent after this
+
+    Returns:
+        True if email was queued, False otherwise
+    """
+    subject, html_content, text_content = render_password_reset_email(user_name, reset_token, reset_code)
+    return queue_email(to_email, subject, html_content, text_content, expires_at)
+
+
+def send_password_changed_notification(
+    to_email: str,
+    user_name: str,
+    ip_address: Optional[str] = None
+) -> bool:
+    """Queue a notification that the password was changed.
+
+    Args:
+        to_email: User's email address
+        user_name: User's display name
+        ip_address: IP address where the change was made (optional)
+
+    Returns:
+        True if email was queued, False otherwise
+    """
+    subject, html_content, text_content = render_password_changed_email(user_name, ip_address)
+    return queue_email(to_email, subject, html_content, text_content)
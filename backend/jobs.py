@@ -0,0 +1,113 @@
+"""
+LVS Portal - Background Jobs
+Periodic maintenance tasks run inside the API process
+"""
+import asyncio
+from typing import Callable, List
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import (
+    NDA_EXPIRY_SWEEP_INTERVAL_MINUTES, NDA_EXPIRY_WARNING_DAYS,
+    COMMENT_RETENTION_DAYS, COMMENT_COMPACTION_INTERVAL_MINUTES,
+    COMMENT_COMPACTION_BATCH_SIZE, EMAIL_OUTBOX_POLL_SECONDS,
+    EMAIL_OUTBOX_RETENTION_DAYS, EMAIL_OUTBOX_PURGE_INTERVAL_MINUTES
+)
+from database import sweep_nda_expirations, compact_deleted_comments, purge_email_outbox, log_audit
+from email_service import process_email_outbox
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+def nda_expiry_sweep_job() -> None:
+    """Expire overdue NDAs in bulk and report upcoming expirations."""
+    result = sweep_nda_expirations(NDA_EXPIRY_WARNING_DAYS)
+
+    if result["expired"]:
+        log_audit(None, "NDA_EXPIRY_SWEEP", f"Expired {result['expired']} NDAs")
+        print(f"NDA sweep: expired {result['expired']} NDAs")
+
+    if result["expiring"]:
+        print(
+            f"NDA sweep: {len(result['expiring'])} NDAs expire within "
+            f"{NDA_EXPIRY_WARNING_DAYS} days"
+        )
+
+
+def comment_compaction_job() -> None:
+    """Remove soft-deleted comments past the retention window."""
+    result = compact_deleted_comments(COMMENT_RETENTION_DAYS, COMMENT_COMPACTION_BATCH_SIZE)
+
+    if result["reclaimed"]:
+        log_audit(
+            None, "COMMENT_COMPACTION",
+            f"Removed {result['reclaimed']} deleted comments, freed {result['freed_pages']} pages"
+        )
+        print(
+            f"Comment compaction: removed {result['reclaimed']} deleted comments "
+            f"in {result['batches']} batches, freed {result['freed_pages']} pages"
+        )
+
+
+def email_outbox_job() -> None:
+    """Deliver queued emails."""
+    result = process_email_outbox()
+
+    if result["sent"] or result["retrying"] or result["dead"]:
+        print(
+            f"Email outbox: sent {result['sent']}, retrying {result['retrying']}, "
+            f"dead-lettered {result['dead']}"
+        )
+
+
+def email_outbox_purge_job() -> None:
+    """Delete sent emails past the retention window; their bodies held reset links."""
+    purged = purge_email_outbox(EMAIL_OUTBOX_RETENTION_DAYS)
+
+    if purged:
+        print(f"Email outbox: purged {purged} old emails")
+
+
+# (name, interval in seconds, job function)
+SCHEDULED_JOBS = [
+    ("nda-expiry-sweep", NDA_EXPIRY_SWEEP_INTERVAL_MINUTES * 60, nda_expiry_sweep_job),
+    ("comment-compaction", COMMENT_COMPACTION_INTERVAL_MINUTES * 60, comment_compaction_job),
+    ("email-outbox", EMAIL_OUTBOX_POLL_SECONDS, email_outbox_job),
+    ("email-outbox-purge", EMAIL_OUTBOX_PURGE_INTERVAL_MINUTES * 60, email_outbox_purge_job),
+]
+
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+async def run_periodically(name: str, interval_seconds: int, job: Callable[[], None]) -> None:
+    """Run a blocking job in the threadpool every interval_seconds.
+
+    Runs once immediately so a freshly started instance catches up.
+    Errors are logged and never stop the loop.
+    """
+    while True:
+        try:
+            await run_in_threadpool(job)
+        except Exception as e:
+            print(f"Background job {name} failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def start_background_jobs() -> List[asyncio.Task]:
+    """Start all scheduled jobs with a positive interval."""
+    return [
+        asyncio.create_task(run_periodically(name, interval, job))
+        for name, interval, job in SCHEDULED_JOBS
+        if interval > 0
+    ]
+
+
+async def stop_background_jobs(tasks: List[asyncio.Task]) -> None:
+    """Cancel running jobs and wait for them to finish."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
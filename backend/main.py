@@ -2,46 +2,84 @@
 LVS Portal - FastAPI Backend
 Main application entry point
 """
+import secrets
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from config import CORS_ORIGINS
-
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all responses."""
-
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        # Prevent MIME type sniffing
-        response.headers["X-Content-Type-Options"] = "nosniff"
-
-        # Prevent clickjacking
-        response.headers["X-Frame-Options"] = "DENY"
-
-        # XSS protection (legacy browsers)
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-
-        # Control referrer information
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-
-        # HTTPS enforcement (Cloud Run handles TLS, but this ensures browsers remember)
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-
-        # Restrict browser features
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-
-        return response
-from database import init_database, seed_default_users, seed_production_users, migrate_add_nda_columns
+from config import (
+    CORS_ORIGINS, COMPRESSION_ENABLED, METRICS_TOKEN, METRICS_PUBLIC, REQUEST_TIMING_ENABLED
+)
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware
+from request_timing import RequestTimingMiddleware
+from responses import FastJSONResponse
+
+
+# Static security headers, pre-encoded once for every response
+SECURITY_HEADERS = [
+    # Prevent MIME type sniffing
+    (b"x-content-type-options", b"nosniff"),
+    # Prevent clickjacking
+    (b"x-frame-options", b"DENY"),
+    # XSS protection (legacy browsers)
+    (b"x-xss-protection", b"1; mode=block"),
+    # Control referrer information
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    # HTTPS enforcement (Cloud Run handles TLS, but this ensures browsers remember)
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    # Restrict browser features
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
+
+
+class SecurityHeadersMiddleware:
+    """
+    Add security headers to all responses.
+
+    Plain ASGI rather than BaseHTTPMiddleware: the headers are appended to
+    the http.response.start message as it passes through, so there is no
+    extra task or memory stream per request and streaming responses
+    (SSE, exports) are forwarded untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = [
+                    (name, value) for name, value in message.get("headers", ())
+                    if name.lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+from database import (
+    init_database, migrate_database, seed_default_users, seed_production_users,
+    init_comment_search
+)
+from jobs import start_background_jobs, stop_background_jobs
 from auth import router as auth_router
 from admin import router as admin_router
 from nda import router as nda_router
 from comments import router as comments_router
+from portal_data import router as portal_data_router
+from analytics import router as analytics_router
 
 
 @asynccontextmanager
@@ -50,13 +88,16 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Starting LVS Portal API...")
     init_database()
-    migrate_add_nda_columns()
+    migrate_database()
+    init_comment_search()
     seed_default_users()
     seed_production_users()
     print("Database initialized.")
+    background_jobs = start_background_jobs()
     yield
     # Shutdown
     print("Shutting down LVS Portal API...")
+    await stop_background_jobs(background_jobs)
 
 
 # Create FastAPI app
@@ -65,10 +106,15 @@ app = FastAPI(
     description="Secure authentication API for Lola Vision Systems portals",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
 )
 
+# Response compression (innermost, so it sees the body exactly as routes produce it)
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 # Security headers middleware (runs first, wraps response)
 app.add_middleware(SecurityHeadersMiddleware)
 
@@ -82,6 +128,13 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Per-request Server-Timing header and access log
+if REQUEST_TIMING_ENABLED:
+    app.add_middleware(RequestTimingMiddleware)
+
+# Request metrics (outermost, so latency covers every other middleware)
+app.add_middleware(MetricsMiddleware)
+
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -99,6 +152,8 @@ app.include_router(auth_router)
 app.include_router(admin_router)
 app.include_router(nda_router)
 app.include_router(comments_router)
+app.include_router(portal_data_router)
+app.include_router(analytics_router)
 
 
 # Health check endpoint
@@ -108,6 +163,22 @@ async def health_check():
     return {"status": "healthy", "service": "lvs-portal-api"}
 
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Prometheus metrics. Requires `Authorization: Bearer <METRICS_TOKEN>`;
+    404 when no token is configured, unless METRICS_PUBLIC is set.
+    """
+    if METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "")
+        if not secrets.compare_digest(supplied.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+            return JSONResponse(status_code=401, content={"detail": "Invalid metrics token"})
+    elif not METRICS_PUBLIC:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
 # Root endpoint
 @app.get("/")
 async def root():
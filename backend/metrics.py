@@ -0,0 +1,135 @@
+"""
+LVS Portal - Metrics
+Prometheus instruments for requests, database queries, password hashing,
+Turso sync, GCS and email delivery, exposed at GET /metrics
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from request_timing import add_query, add_span
+
+# ============================================================================
+# INSTRUMENTS
+# ============================================================================
+
+REQUEST_DURATION = Histogram(
+    "lvs_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "lvs_http_requests_in_progress",
+    "HTTP requests currently being handled",
+)
+
+DB_QUERY_DURATION = Histogram(
+    "lvs_db_query_duration_seconds",
+    "SQLite statement execution time by calling function",
+    ["function"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "lvs_password_hash_duration_seconds",
+    "Argon2 hash and verify time",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+TURSO_SYNC_DURATION = Histogram(
+    "lvs_turso_sync_duration_seconds",
+    "Turso embedded replica sync time",
+    ["operation", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+GCS_REQUEST_DURATION = Histogram(
+    "lvs_gcs_request_duration_seconds",
+    "Google Cloud Storage call latency",
+    ["operation", "outcome"],
+)
+
+EMAIL_SEND_DURATION = Histogram(
+    "lvs_email_send_duration_seconds",
+    "Email transport send latency",
+    ["outcome"],
+)
+EMAIL_DELIVERIES = Counter(
+    "lvs_email_deliveries_total",
+    "Email delivery results: sent, retrying (outbox backoff), dead (dead-lettered), failed (immediate send)",
+    ["outcome"],
+)
+
+
+# Server-Timing / access log span names for histograms timed with track()
+_REQUEST_SPANS = {
+    TURSO_SYNC_DURATION: "turso",
+    GCS_REQUEST_DURATION: "gcs",
+    EMAIL_SEND_DURATION: "email",
+}
+
+
+@contextmanager
+def track(histogram: Histogram, *labels: str) -> Iterator[None]:
+    """Time a block into `histogram`, with a final "ok"/"error" outcome label."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.labels(*labels, outcome).observe(elapsed)
+        add_span(_REQUEST_SPANS[histogram], elapsed)
+
+
+def observe_query(function: str, seconds: float) -> None:
+    """Record one database statement run by `function`."""
+    DB_QUERY_DURATION.labels(function).observe(seconds)
+    add_query(seconds)
+
+
+# ============================================================================
+# REQUEST MIDDLEWARE
+# ============================================================================
+
+class MetricsMiddleware:
+    """
+    Record request latency by route template (e.g. /comments/{account_id}),
+    so per-id paths don't create a series each. Requests that match no
+    route are labelled "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - start)
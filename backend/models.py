@@ -3,7 +3,7 @@ LVS Portal - Pydantic Models
 Request/Response validation models
 """
 from datetime import datetime
-from typing import Optional, Literal
+from typing import Optional, Literal, List
 from pydantic import BaseModel, EmailStr, Field, field_validator
 import re
 
@@ -136,6 +136,12 @@ class ResetPasswordRequest(BaseModel):
         return v
 
 
+class BulkExtendNDARequest(BaseModel):
+    """Renew NDAs for several users at once (founder only)."""
+    user_ids: List[int] = Field(..., min_length=1, max_length=500)
+    expires_days: int = Field(365, ge=1, le=3650)
+
+
 # ============================================================================
 # RESPONSE MODELS
 # ============================================================================
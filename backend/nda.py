@@ -6,8 +6,12 @@ import os
 from datetime import datetime
 from typing import Optional, List
 
-from fastapi import APIRouter, HTTPException, status, Request, Depends, UploadFile, File, Form
-from fastapi.responses import RedirectResponse
+from fastapi import (
+    APIRouter, HTTPException, status, Request, Depends, UploadFile, File, Form,
+    BackgroundTasks
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse, Response
 from pydantic import BaseModel
 from google.cloud import storage
 
@@ -15,8 +19,15 @@ from auth import get_current_user, require_founder, get_client_ip
 from database import (
     get_db_connection, log_audit, get_user_by_id,
     create_nda_document, get_nda_document, get_user_nda_documents,
-    get_pending_nda_documents, get_all_nda_documents, review_nda_document
+    get_pending_nda_documents, get_all_nda_documents, review_nda_document,
+    set_nda_document_preview, get_nda_documents_without_preview,
+    reset_unavailable_nda_previews
+)
+from previews import (
+    render_preview, get_preview_path, PREVIEW_CONTENT_TYPE, PREVIEW_UNAVAILABLE, PIL_AVAILABLE
 )
+from responses import model_response
+from metrics import track, GCS_REQUEST_DURATION
 
 router = APIRouter(prefix="/nda", tags=["NDA Documents"])
 
@@ -32,6 +43,64 @@ except Exception as e:
     storage_client = None
     bucket = None
 
+# Previews never change for a given document, so browsers may keep them for a year
+PREVIEW_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def download_blob(gcs_path: str) -> bytes:
+    """Download an object from the documents bucket."""
+    with track(GCS_REQUEST_DURATION, "download"):
+        return bucket.blob(gcs_path).download_as_bytes()
+
+
+# ============================================================================
+# PREVIEW GENERATION (runs as a background task)
+# ============================================================================
+
+def generate_nda_preview(
+    doc_id: int,
+    gcs_path: str,
+    content_type: str,
+    contents: Optional[bytes] = None
+) -> Optional[bytes]:
+    """
+    Render a first-page thumbnail and cache it in GCS alongside the document.
+    Downloads the original only when the caller doesn't already hold it.
+    Returns the preview bytes, or None if no preview could be produced.
+    Without Pillow nothing is attempted or recorded, so the document stays
+    queued for backfill.
+    """
+    if bucket is None or not PIL_AVAILABLE:
+        return None
+
+    try:
+        if contents is None:
+            contents = download_blob(gcs_path)
+
+        preview = render_preview(contents, content_type)
+        if preview is None:
+            set_nda_document_preview(doc_id, PREVIEW_UNAVAILABLE)
+            return None
+
+        preview_path = get_preview_path(gcs_path)
+        blob = bucket.blob(preview_path)
+        blob.cache_control = PREVIEW_CACHE_CONTROL
+        with track(GCS_REQUEST_DURATION, "upload"):
+            blob.upload_from_string(preview, content_type=PREVIEW_CONTENT_TYPE)
+
+        set_nda_document_preview(doc_id, preview_path)
+        return preview
+    except Exception as e:
+        print(f"Preview generation error for document {doc_id}: {e}")
+        return None
+
+
+def get_preview_url(doc: dict) -> Optional[str]:
+    """API path of a document's preview, if one has been generated."""
+    if doc.get("preview_path"):
+        return f"/nda/{doc['id']}/preview"
+    return None
+
 
 # ============================================================================
 # REQUEST/RESPONSE MODELS
@@ -54,6 +123,7 @@ class NDADocumentResponse(BaseModel):
     name: Optional[str] = None
     company: Optional[str] = None
     portal_type: Optional[str] = None
+    preview_url: Optional[str] = None
 
 
 class ReviewNDARequest(BaseModel):
@@ -68,6 +138,7 @@ class ReviewNDARequest(BaseModel):
 @router.post("/upload", response_model=NDADocumentResponse)
 async def upload_nda(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
@@ -110,7 +181,8 @@ async def upload_nda(
     try:
         # Upload to GCS
         blob = bucket.blob(gcs_path)
-        blob.upload_from_string(contents, content_type=file.content_type)
+        with track(GCS_REQUEST_DURATION, "upload"):
+            blob.upload_from_string(contents, content_type=file.content_type)
 
         # Create database record
         doc_id = create_nda_document(
@@ -123,7 +195,8 @@ async def upload_nda(
 
         if not doc_id:
             # Rollback GCS upload
-            blob.delete()
+            with track(GCS_REQUEST_DURATION, "delete"):
+                blob.delete()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to save document record."
@@ -131,6 +204,10 @@ async def upload_nda(
 
         log_audit(user_id, "NDA_UPLOADED", f"Uploaded: {file.filename}", client_ip)
 
+        background_tasks.add_task(
+            generate_nda_preview, doc_id, gcs_path, file.content_type, contents
+        )
+
         # Get the created document
         doc = get_nda_document(doc_id)
         return NDADocumentResponse(
@@ -162,7 +239,7 @@ async def get_my_documents(current_user: dict = Depends(get_current_user)):
     """Get all NDA documents uploaded by the current user."""
     docs = get_user_nda_documents(current_user["id"])
 
-    return [
+    return model_response([
         NDADocumentResponse(
             id=doc["id"],
             user_id=doc["user_id"],
@@ -176,7 +253,7 @@ async def get_my_documents(current_user: dict = Depends(get_current_user)):
             review_notes=doc.get("review_notes")
         )
         for doc in docs
-    ]
+    ])
 
 
 # ============================================================================
@@ -188,7 +265,7 @@ async def get_pending_documents(current_user: dict = Depends(require_founder)):
     """Get all pending NDA documents for review (Founder only)."""
     docs = get_pending_nda_documents()
 
-    return [
+    return model_response([
         NDADocumentResponse(
             id=doc["id"],
             user_id=doc["user_id"],
@@ -200,10 +277,11 @@ async def get_pending_documents(current_user: dict = Depends(require_founder)):
             email=doc.get("email"),
             name=doc.get("name"),
             company=doc.get("company"),
-            portal_type=doc.get("portal_type")
+            portal_type=doc.get("portal_type"),
+            preview_url=get_preview_url(doc)
         )
         for doc in docs
-    ]
+    ])
 
 
 @router.get("/all", response_model=List[NDADocumentResponse])
@@ -214,7 +292,7 @@ async def get_all_documents(
     """Get all NDA documents, optionally filtered by status (Founder only)."""
     docs = get_all_nda_documents(status_filter)
 
-    return [
+    return model_response([
         NDADocumentResponse(
             id=doc["id"],
             user_id=doc["user_id"],
@@ -229,10 +307,11 @@ async def get_all_documents(
             portal_type=doc.get("portal_type"),
             reviewer_name=doc.get("reviewer_name"),
             reviewed_at=str(doc["reviewed_at"]) if doc.get("reviewed_at") else None,
-            review_notes=doc.get("review_notes")
+            review_notes=doc.get("review_notes"),
+            preview_url=get_preview_url(doc)
         )
         for doc in docs
-    ]
+    ])
 
 
 @router.get("/{doc_id}", response_model=NDADocumentResponse)
@@ -263,10 +342,70 @@ async def get_document(
         portal_type=doc.get("portal_type"),
         reviewer_name=doc.get("reviewer_name"),
         reviewed_at=str(doc["reviewed_at"]) if doc.get("reviewed_at") else None,
-        review_notes=doc.get("review_notes")
+        review_notes=doc.get("review_notes"),
+        preview_url=get_preview_url(doc)
     )
 
 
+@router.get("/{doc_id}/preview")
+async def get_document_preview(
+    request: Request,
+    doc_id: int,
+    current_user: dict = Depends(require_founder)
+):
+    """
+    Get a small PNG thumbnail of the document's first page (Founder only).
+    Served with long-lived cache headers so the review queue only pays for
+    each preview once. Documents uploaded before previews existed are
+    rendered on first view.
+    """
+    doc = get_nda_document(doc_id)
+
+    if not doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found."
+        )
+
+    # Already rendered once and nothing came out; don't download and retry
+    if doc.get("preview_path") == PREVIEW_UNAVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Preview not available for this document."
+        )
+
+    etag = f'"nda-preview-{doc_id}"'
+    cache_headers = {"Cache-Control": PREVIEW_CACHE_CONTROL, "ETag": etag}
+
+    if doc.get("preview_path") and request.headers.get("If-None-Match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    if bucket is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="File storage not available."
+        )
+
+    try:
+        if doc.get("preview_path"):
+            preview = await run_in_threadpool(download_blob, doc["preview_path"])
+        else:
+            preview = await run_in_threadpool(
+                generate_nda_preview, doc_id, doc["gcs_path"], doc["content_type"]
+            )
+    except Exception as e:
+        print(f"Preview download error: {e}")
+        preview = None
+
+    if preview is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Preview not available for this document."
+        )
+
+    return Response(content=preview, media_type=PREVIEW_CONTENT_TYPE, headers=cache_headers)
+
+
 @router.get("/{doc_id}/download")
 async def download_document(
     doc_id: int,
@@ -290,11 +429,12 @@ async def download_document(
     try:
         blob = bucket.blob(doc["gcs_path"])
         # Generate signed URL valid for 15 minutes
-        url = blob.generate_signed_url(
-            version="v4",
-            expiration=900,  # 15 minutes
-            method="GET"
-        )
+        with track(GCS_REQUEST_DURATION, "sign_url"):
+            url = blob.generate_signed_url(
+                version="v4",
+                expiration=900,  # 15 minutes
+                method="GET"
+            )
         return {"download_url": url, "filename": doc["filename"]}
     except Exception as e:
         print(f"Download URL generation error: {e}")
@@ -360,6 +500,48 @@ async def review_document(
     }
 
 
+@router.post("/previews/backfill")
+async def backfill_previews(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    limit: int = 50,
+    retry_unavailable: bool = False,
+    current_user: dict = Depends(require_founder)
+):
+    """
+    Queue preview generation for documents that don't have one yet (Founder only).
+    Rendering runs in the background after the response is sent.
+    retry_unavailable also re-queues documents previously marked as having
+    no preview, e.g. after upgrading the renderer.
+    """
+    client_ip = get_client_ip(request)
+
+    if bucket is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="File storage not available."
+        )
+
+    if not PIL_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Preview rendering not available."
+        )
+
+    if retry_unavailable:
+        reset_unavailable_nda_previews()
+
+    docs = get_nda_documents_without_preview(limit)
+    for doc in docs:
+        background_tasks.add_task(
+            generate_nda_preview, doc["id"], doc["gcs_path"], doc["content_type"]
+        )
+
+    log_audit(current_user["id"], "NDA_PREVIEWS_BACKFILL", f"Queued {len(docs)} previews", client_ip)
+
+    return {"success": True, "queued": len(docs)}
+
+
 # ============================================================================
 # BULK IMPORT ENDPOINT (for importing existing NDAs)
 # ============================================================================
@@ -375,6 +557,7 @@ class BulkImportRequest(BaseModel):
 @router.post("/admin-upload", response_model=NDADocumentResponse)
 async def admin_upload_nda(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user_email: str = Form(...),
     auto_approve: bool = Form(True),
@@ -427,7 +610,8 @@ async def admin_upload_nda(
     try:
         # Upload to GCS
         blob = bucket.blob(gcs_path)
-        blob.upload_from_string(contents, content_type=file.content_type)
+        with track(GCS_REQUEST_DURATION, "upload"):
+            blob.upload_from_string(contents, content_type=file.content_type)
 
         # Create database record
         doc_id = create_nda_document(
@@ -439,7 +623,8 @@ async def admin_upload_nda(
         )
 
         if not doc_id:
-            blob.delete()
+            with track(GCS_REQUEST_DURATION, "delete"):
+                blob.delete()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to save document record."
@@ -454,6 +639,10 @@ async def admin_upload_nda(
                 notes=notes or "Uploaded by founder"
             )
 
+        background_tasks.add_task(
+            generate_nda_preview, doc_id, gcs_path, file.content_type, contents
+        )
+
         log_audit(
             current_user["id"],
             "NDA_ADMIN_UPLOADED",
@@ -492,6 +681,7 @@ async def admin_upload_nda(
 @router.post("/import", response_model=NDADocumentResponse)
 async def import_nda(
     request: Request,
+    background_tasks: BackgroundTasks,
     body: BulkImportRequest,
     current_user: dict = Depends(require_founder)
 ):
@@ -518,14 +708,17 @@ async def import_nda(
         )
 
     blob = bucket.blob(body.gcs_path)
-    if not blob.exists():
+    with track(GCS_REQUEST_DURATION, "exists"):
+        exists = blob.exists()
+    if not exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"File not found in storage: {body.gcs_path}"
         )
 
     # Get file info
-    blob.reload()
+    with track(GCS_REQUEST_DURATION, "metadata"):
+        blob.reload()
     file_size = blob.size
     content_type = blob.content_type or "application/pdf"
 
@@ -553,6 +746,8 @@ async def import_nda(
             notes=body.notes or "Imported from existing executed NDA"
         )
 
+    background_tasks.add_task(generate_nda_preview, doc_id, body.gcs_path, content_type)
+
     log_audit(
         current_user["id"],
         "NDA_IMPORTED",
@@ -0,0 +1,401 @@
+"""
+LVS Portal - Portal Data
+Financial model, customer and pipeline files served behind authentication
+and NDA checks, from memory, with ETag revalidation
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
+
+from fastapi import APIRouter, HTTPException, status, Request, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from fastapi.security import HTTPAuthorizationCredentials
+
+from auth import get_current_user, security
+from database import check_nda_access
+from security import decode_access_token
+from responses import encode_json, json_response
+from config import (
+    PORTAL_DATA_DIR, PORTAL_DATA_FILES, PORTAL_DATA_CACHE_CONTROL,
+    PORTAL_DATA_USER_CACHE_SECONDS, PORTAL_DATA_USER_CACHE_SIZE
+)
+
+router = APIRouter(prefix="/data", tags=["Portal Data"])
+
+
+# ============================================================================
+# FILE CACHE
+# ============================================================================
+
+class PortalDataFile:
+    """
+    One data file held in memory. The file is stat'ed on every request and
+    re-read only when its mtime or size changes.
+    """
+
+    def __init__(self, path: str, media_type: str):
+        self.path = PORTAL_DATA_DIR / path
+        self.media_type = media_type
+        # (body, etag) of the last good copy, replaced as a whole so readers
+        # never see the body of one version with the ETag of another
+        self._version: Optional[Tuple[bytes, str]] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Tuple[bytes, str]:
+        """
+        Return (body, etag), reloading first if the file changed on disk.
+        Raises FileNotFoundError while there is no good copy to serve.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            stat = None
+
+        if stat is not None:
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp != self._stamp:
+                with self._lock:
+                    if stamp != self._stamp:
+                        self._load(stamp)
+
+        version = self._version  # Keep serving the last good copy
+        if version is None:
+            raise FileNotFoundError(str(self.path))
+        return version
+
+    def _load(self, stamp: Tuple[int, int]) -> None:
+        with open(self.path, "rb") as f:
+            body = f.read()
+
+        if self.media_type == "application/json":
+            try:
+                json.loads(body)
+            except ValueError as e:
+                # Probably caught mid-write; the stamp is left alone so the
+                # next request reads it again
+                print(f"Portal data {self.path.name} is not valid JSON: {e}")
+                return
+
+        self._version = (body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+        self._stamp = stamp
+        print(f"Portal data loaded: {self.path.name} ({len(body)} bytes)")
+
+
+data_files: Dict[str, PortalDataFile] = {
+    name: PortalDataFile(spec["path"], spec["media_type"])
+    for name, spec in PORTAL_DATA_FILES.items()
+}
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires (W/ prefixes ignored)."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+# ============================================================================
+# USER CONTEXT CACHE
+# ============================================================================
+
+# token jti -> (expires at, {id, portal_type, nda})
+_user_contexts: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_user_contexts_lock = threading.Lock()
+
+
+async def get_data_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Dict[str, Any]:
+    """
+    Dependency: the caller's id, portal type, company and NDA check.
+
+    Dashboards fetch several data files per page load, so the session and
+    user lookups behind get_current_user are reused per token for
+    PORTAL_DATA_USER_CACHE_SECONDS. A logout or NDA change therefore takes
+    up to that long to apply here.
+    """
+    payload = decode_access_token(credentials.credentials)
+    jti = payload.get("jti") if payload else None
+    now = time.monotonic()
+
+    if jti:
+        with _user_contexts_lock:
+            cached = _user_contexts.get(jti)
+            if cached and cached[0] > now:
+                _user_contexts.move_to_end(jti)
+                return cached[1]
+
+    # Full check: signature, expiry, session not revoked, user active
+    user = await get_current_user(credentials)
+    context = {
+        "id": user["id"],
+        "portal_type": user["portal_type"],
+        "company": user.get("company"),
+        "nda": check_nda_access(user),
+    }
+
+    with _user_contexts_lock:
+        _user_contexts[jti] = (now + PORTAL_DATA_USER_CACHE_SECONDS, context)
+        _user_contexts.move_to_end(jti)
+        while len(_user_contexts) > PORTAL_DATA_USER_CACHE_SIZE:
+            _user_contexts.popitem(last=False)
+
+    return context
+
+
+# ============================================================================
+# CUSTOMER REGISTRY
+# ============================================================================
+
+def company_key(value: str) -> str:
+    """Normalize a company name or id for lookup: 'First Genesis' -> 'firstgenesis'."""
+    return re.sub(r"[^a-z0-9]", "", (value or "").lower())
+
+
+class CustomerIndex:
+    """
+    One version of data/customers.json indexed by customer id, company and
+    tier. Every record is also kept encoded with its own ETag, so serving a
+    whole record is a lookup.
+    """
+
+    def __init__(self, customers: List[Dict[str, Any]]):
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_company: Dict[str, List[str]] = {}
+        self.by_tier: Dict[str, List[str]] = {}
+        self.encoded: Dict[str, Tuple[bytes, str]] = {}
+        fields: Dict[str, None] = {}
+
+        for record in customers:
+            customer_id = str(record.get("id", ""))
+            if not customer_id:
+                continue
+            self.by_id[customer_id] = record
+            for key in {company_key(customer_id), company_key(record.get("name", ""))}:
+                self.by_company.setdefault(key, []).append(customer_id)
+            self.by_tier.setdefault(str(record.get("tier", "")), []).append(customer_id)
+            body = encode_json(record)
+            self.encoded[customer_id] = (body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+            fields.update(dict.fromkeys(record))
+
+        self.fields: List[str] = list(fields)
+
+    def ids_for_company(self, company: Optional[str]) -> List[str]:
+        """Customer ids belonging to a user's company."""
+        return self.by_company.get(company_key(company), []) if company else []
+
+
+class CustomerRegistry:
+    """The CustomerIndex for the current customers.json, rebuilt when its ETag changes."""
+
+    def __init__(self, source: PortalDataFile):
+        self.source = source
+        self._lock = threading.Lock()
+        self._etag: Optional[str] = None
+        self._index: Optional[CustomerIndex] = None
+
+    def current(self) -> CustomerIndex:
+        body, etag = self.source.current()
+        with self._lock:
+            if etag != self._etag:
+                self._index = CustomerIndex(json.loads(body).get("customers", []))
+                self._etag = etag
+            return self._index
+
+
+customer_registry = CustomerRegistry(data_files["customers"])
+
+
+def parse_customer_fields(fields: Optional[str], index: CustomerIndex) -> Optional[List[str]]:
+    """Validate a comma-separated field list; None means the whole record."""
+    if not fields:
+        return None
+    selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in selected if f not in index.fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(index.fields)}"
+        )
+    # The id is always returned
+    if "id" not in selected:
+        selected.insert(0, "id")
+    return selected
+
+
+def project_customer(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """The record, or only the selected fields it has."""
+    if fields is None:
+        return record
+    return {f: record[f] for f in fields if f in record}
+
+
+async def load_customer_index() -> CustomerIndex:
+    """The current customer index, or 404 if customers.json is missing."""
+    try:
+        return await run_in_threadpool(customer_registry.current)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer data is not available."
+        )
+
+
+def require_data_access(current_user: Dict[str, Any]) -> None:
+    """Customers and partners need a valid NDA before seeing any record."""
+    nda = current_user["nda"]
+    if not nda["allowed"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=nda["reason"]
+        )
+
+
+def customer_response(
+    request: Request,
+    index: CustomerIndex,
+    customer_id: str,
+    fields: Optional[List[str]]
+) -> Response:
+    """One customer record (pre-encoded) or its projection, with ETag/304."""
+    if fields is None:
+        body, etag = index.encoded[customer_id]
+    else:
+        body = None
+        full_etag = index.encoded[customer_id][1]
+        etag = '"' + hashlib.sha256(f"{full_etag}:{','.join(fields)}".encode()).hexdigest()[:32] + '"'
+
+    cache_headers = {"ETag": etag, "Cache-Control": PORTAL_DATA_CACHE_CONTROL}
+    if etag_matches(request.headers.get("If-None-Match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    if body is None:
+        return json_response(project_customer(index.by_id[customer_id], fields), headers=cache_headers)
+    return Response(content=body, media_type="application/json", headers=cache_headers)
+
+
+# ============================================================================
+# ENDPOINTS
+# ============================================================================
+
+# Declared before /{name} so the customer routes aren't taken as file names
+@router.get("/customers/mine")
+async def get_my_customer_record(
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
+    current_user: Dict[str, Any] = Depends(get_data_user)
+):
+    """
+    The customer record for the caller's own company, for customer and
+    partner portals that render a single company.
+    """
+    require_data_access(current_user)
+    index = await load_customer_index()
+
+    ids = index.ids_for_company(current_user.get("company"))
+    if not ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No customer record for your company."
+        )
+
+    return customer_response(request, index, ids[0], parse_customer_fields(fields, index))
+
+
+@router.get("/customers/tier/{tier}")
+async def get_customers_by_tier(
+    tier: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
+    current_user: Dict[str, Any] = Depends(get_data_user)
+):
+    """All customers in a tier (1-4 or 'strategic'), optionally projected (Founders and investors)."""
+    if current_user["portal_type"] not in PORTAL_DATA_FILES["customers"]["portal_types"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have access to this data."
+        )
+    index = await load_customer_index()
+    selected = parse_customer_fields(fields, index)
+
+    customers = [project_customer(index.by_id[i], selected) for i in index.by_tier.get(tier, [])]
+    return json_response({"tier": tier, "customers": customers, "count": len(customers)})
+
+
+@router.get("/customers/{customer_id}")
+async def get_customer_record(
+    customer_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
+    current_user: Dict[str, Any] = Depends(get_data_user)
+):
+    """
+    One customer record, optionally projected to `fields`.
+    Founders and investors can read any customer; customers and partners
+    only their own company's.
+    """
+    require_data_access(current_user)
+    index = await load_customer_index()
+
+    if current_user["portal_type"] not in PORTAL_DATA_FILES["customers"]["portal_types"]:
+        if customer_id not in index.ids_for_company(current_user.get("company")):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only view your own company's record."
+            )
+
+    if customer_id not in index.by_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer not found."
+        )
+
+    return customer_response(request, index, customer_id, parse_customer_fields(fields, index))
+
+
+@router.get("/{name}")
+async def get_portal_data(
+    name: str,
+    request: Request,
+    current_user: Dict[str, Any] = Depends(get_data_user)
+):
+    """
+    Get a portal data file: financial-model, customers or pipeline (CSV).
+    Customers and partners need an approved, unexpired NDA.
+    Send the returned ETag as If-None-Match to get a 304 when unchanged.
+    """
+    data_file = data_files.get(name)
+    if data_file is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown data file. Choose from: {', '.join(data_files)}"
+        )
+
+    if current_user["portal_type"] not in PORTAL_DATA_FILES[name]["portal_types"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have access to this data."
+        )
+
+    require_data_access(current_user)
+
+    try:
+        body, etag = await run_in_threadpool(data_file.current)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="This data file is not available."
+        )
+
+    cache_headers = {"ETag": etag, "Cache-Control": PORTAL_DATA_CACHE_CONTROL}
+    if etag_matches(request.headers.get("If-None-Match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    return Response(content=body, media_type=data_file.media_type, headers=cache_headers)
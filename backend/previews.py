@@ -0,0 +1,148 @@
+"""
+LVS Portal - NDA Document Previews
+Small first-page thumbnails for the founder NDA review queue
+"""
+import re
+import zlib
+from io import BytesIO
+from typing import Optional
+
+from config import NDA_PREVIEW_MAX_PX, NDA_PREVIEW_MAX_SOURCE_PIXELS
+
+# Pillow renders NDA previews; without it documents are left unrendered
+# (preview_path NULL) so a later backfill picks them up once it is installed
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    print("Warning: Pillow not installed. NDA previews disabled.")
+
+PREVIEW_CONTENT_TYPE = "image/png"
+PREVIEW_SUFFIX = ".preview.png"
+# preview_path value recorded when a render was attempted and produced nothing
+PREVIEW_UNAVAILABLE = ""
+
+# PDF image XObject header, e.g. "7 0 obj << /Subtype /Image ... >> stream"
+_PDF_IMAGE_RE = re.compile(
+    rb"\d+\s+\d+\s+obj\s*<<((?:(?!endobj|>>\s*stream).)*?/Subtype\s*/Image"
+    rb"(?:(?!endobj|>>\s*stream).)*?)>>\s*stream\r?\n",
+    re.DOTALL
+)
+_PDF_INT_RE = {
+    key: re.compile(rb"/" + key + rb"\s+(\d+)")
+    for key in (b"Width", b"Height", b"BitsPerComponent")
+}
+# Direct /Length only; "/Length 12 0 R" points at another object
+_PDF_LENGTH_RE = re.compile(rb"/Length\s+(\d+)\b(?!\s+\d+\s+R)")
+_PDF_CHANNELS = {"RGB": 3, "L": 1}
+
+
+def get_preview_path(gcs_path: str) -> str:
+    """GCS path of the cached preview stored alongside a document."""
+    return f"{gcs_path}{PREVIEW_SUFFIX}"
+
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+def _check_source_size(width: int, height: int):
+    """Refuse images too large to decode safely, before allocating anything."""
+    if width <= 0 or height <= 0 or width * height > NDA_PREVIEW_MAX_SOURCE_PIXELS:
+        raise ValueError(f"source image {width}x{height} exceeds the preview size limit")
+
+
+def _thumbnail_png(image: "Image.Image") -> bytes:
+    """Downscale an image to fit NDA_PREVIEW_MAX_PX and encode it as PNG."""
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.thumbnail((NDA_PREVIEW_MAX_PX, NDA_PREVIEW_MAX_PX))
+
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _render_image(contents: bytes) -> Optional[bytes]:
+    """Render a PNG/JPEG upload. draft() lets JPEG decode at reduced scale."""
+    image = Image.open(BytesIO(contents))
+    # open() only reads the header, so the declared size is checked before decoding
+    _check_source_size(*image.size)
+    image.draft("RGB", (NDA_PREVIEW_MAX_PX, NDA_PREVIEW_MAX_PX))
+    return _thumbnail_png(image)
+
+
+def _render_pdf(contents: bytes) -> Optional[bytes]:
+    """
+    Pure-Python PDF preview.
+    Signed NDAs are almost always scans, so the first page is a single
+    embedded image. Extract the first image XObject that Pillow can decode
+    (DCTDecode, or 8-bit FlateDecode RGB/Gray) instead of rasterizing the
+    page. Returns None for vector-only PDFs.
+    """
+    for match in _PDF_IMAGE_RE.finditer(contents):
+        header = match.group(1)
+        start = match.end()
+
+        length_match = _PDF_LENGTH_RE.search(header)
+        if length_match:
+            end = start + int(length_match.group(1))
+        else:
+            # Indirect /Length - fall back to scanning for the stream end
+            end = contents.find(b"endstream", start)
+            if end == -1:
+                continue
+        data = contents[start:end]
+
+        try:
+            if b"/DCTDecode" in header:
+                return _render_image(data)
+
+            if b"/FlateDecode" in header and b"/DecodeParms" not in header:
+                sizes = {
+                    key: _PDF_INT_RE[key].search(header)
+                    for key in (b"Width", b"Height", b"BitsPerComponent")
+                }
+                if not all(sizes.values()) or int(sizes[b"BitsPerComponent"].group(1)) != 8:
+                    continue
+                if b"/DeviceRGB" in header:
+                    mode = "RGB"
+                elif b"/DeviceGray" in header:
+                    mode = "L"
+                else:
+                    continue
+                size = (int(sizes[b"Width"].group(1)), int(sizes[b"Height"].group(1)))
+                _check_source_size(*size)
+                # Inflate no more than the declared image needs; a tiny
+                # upload can otherwise expand to gigabytes
+                expected = size[0] * size[1] * _PDF_CHANNELS[mode]
+                pixels = zlib.decompressobj().decompress(data, expected)
+                if len(pixels) < expected:
+                    continue
+                image = Image.frombytes(mode, size, pixels)
+                return _thumbnail_png(image)
+        except Exception as e:
+            print(f"PDF preview image skipped: {e}")
+            continue
+
+    return None
+
+
+def render_preview(contents: bytes, content_type: str) -> Optional[bytes]:
+    """
+    Render a small PNG thumbnail of the first page of an NDA document.
+    Returns None when no preview can be produced.
+    """
+    if not PIL_AVAILABLE:
+        return None
+
+    try:
+        if content_type in ("image/png", "image/jpeg"):
+            return _render_image(contents)
+        if content_type == "application/pdf":
+            return _render_pdf(contents)
+    except Exception as e:
+        print(f"Preview render error: {e}")
+
+    return None
@@ -0,0 +1,243 @@
+"""
+LVS Portal - Query Plan Checks
+Runs EXPLAIN QUERY PLAN on every SQL statement in the backend and fails on
+full table scans of the tables that grow with use.
+
+Usage: python query_plans.py [existing.db]
+Checks a fresh schema by default, or a copy of an existing database after
+running the startup migrations on it, so indexes created by migrations are
+checked the way older deployments get them. Statements assembled at run
+time are checked by running the functions in DYNAMIC_SAMPLES and explaining
+what they execute. Exits 1 when a statement scans a large table or can't be
+explained, so it can gate CI.
+"""
+import ast
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import database
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# Modules whose cursor.execute(...) calls are checked
+CHECKED_MODULES = ("database.py", "admin.py")
+
+# Tables that grow with users, logins and activity; a full scan of these is a bug
+LARGE_TABLES = {
+    "users", "sessions", "login_attempts", "audit_log", "pending_auth",
+    "nda_documents", "account_comments", "account_comment_versions",
+    "comment_read_markers", "email_outbox", "password_reset_tokens",
+}
+
+# Functions allowed to scan: one-off migrations and founder-triggered
+# maintenance that must visit every row
+ALLOWED_SCANS = {
+    "migrate_normalize_nda_dates",
+    "reset_unavailable_nda_previews",
+}
+
+_EXECUTE_METHODS = {"execute", "executemany", "executescript"}
+# The DB layer's own instrumentation, which runs other functions' SQL
+_INSTRUMENTATION_FUNCTIONS = _EXECUTE_METHODS | {"explain_query_plan"}
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SQL_KEYWORDS = {
+    "where", "set", "on", "left", "inner", "join", "order", "group", "limit",
+    "values", "using", "select", "as", "default", "cross", "natural", "union",
+}
+# A scan with no index at all; "SCAN t USING INDEX ..." walks an index instead
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+# Representative calls for the functions that assemble SQL at run time,
+# covering each optional clause. Every statement they execute is explained
+# with the parameters it was run with.
+DYNAMIC_SAMPLES: List[Callable[[], Any]] = [
+    lambda: database.get_existing_emails(["a@example.com", "b@example.com"]),
+    lambda: database.update_nda_status(1, "approved", 1, datetime(2030, 1, 1), datetime(2025, 1, 1), "notes"),
+    lambda: database.get_users_page(["id", "email"]),
+    lambda: database.get_users_page(["id", "email"], "customer", "ac", 1, 50),
+    lambda: database.get_all_users_nda_status(),
+    lambda: database.get_all_users_nda_status(["customer", "partner"], "ac", 1, 50),
+    lambda: database.get_nda_status_summary(),
+    lambda: database.get_nda_status_summary(["customer", "partner"]),
+    lambda: database.extend_nda_expirations([1, 2], datetime(2030, 1, 1)),
+    lambda: database.get_all_nda_documents(),
+    lambda: database.get_all_nda_documents("pending"),
+    lambda: database.get_comments("acme"),
+    lambda: database.get_comments("acme", before=10),
+    lambda: database.get_comments("acme", after=10),
+    lambda: database.get_comments_for_accounts(["acme", "globex"]),
+    lambda: database.mark_emails_sent([1, 2]),
+    lambda: database.requeue_dead_emails(),
+    lambda: database.requeue_dead_emails([1, 2]),
+    lambda: database.search_comments("roadmap"),
+    lambda: database.search_comments("roadmap", "acme"),
+    lambda: list(database.iter_users_for_export()),
+    lambda: list(database.iter_audit_log_for_export(datetime(2025, 1, 1), datetime(2026, 1, 1), "LOGIN")),
+    lambda: list(database.iter_nda_records_for_export(["customer", "partner"])),
+]
+
+
+# ============================================================================
+# DISCOVERY
+# ============================================================================
+
+def iter_statements(path: Path) -> Iterator[Tuple[str, int, Optional[str]]]:
+    """
+    (function, line, sql) for each execute call in a module. sql is None
+    when the statement is assembled at run time (f-strings, concatenation),
+    since its final text can't be known here.
+    """
+    tree = ast.parse(path.read_text(), filename=str(path))
+    for function in ast.walk(tree):
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if function.name in _INSTRUMENTATION_FUNCTIONS:
+            continue
+        for node in ast.walk(function):
+            if not (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr in _EXECUTE_METHODS
+                and node.args
+            ):
+                continue
+            arg = node.args[0]
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                yield function.name, node.lineno, arg.value
+            else:
+                yield function.name, node.lineno, None
+
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """Map each table name and alias in a statement to the table name."""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def capture_statements(samples: List[Callable[[], Any]]) -> List[Tuple[str, str, Any]]:
+    """
+    Run the samples and return (function, sql, parameters) for every
+    statement they executed, as reported by the database instrumentation.
+    """
+    captured = []
+
+    def record(conn, function, sql, parameters, seconds):
+        captured.append((function, sql, parameters))
+
+    log_slow_query, threshold = database.log_slow_query, database.SLOW_QUERY_THRESHOLD_MS
+    database.log_slow_query = record
+    database.SLOW_QUERY_THRESHOLD_MS = 1e-9  # Every statement counts as slow
+    try:
+        for sample in samples:
+            sample()
+    finally:
+        database.log_slow_query, database.SLOW_QUERY_THRESHOLD_MS = log_slow_query, threshold
+    return captured
+
+
+def large_table_scans(sql: str, plan: List[str]) -> List[str]:
+    """The plan lines that fully scan a table in LARGE_TABLES."""
+    aliases = table_aliases(sql)
+    scans = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match:
+            table = aliases.get(match.group(1).lower(), match.group(1).lower())
+            if table in LARGE_TABLES:
+                scans.append(detail)
+    return scans
+
+
+# ============================================================================
+# CHECK
+# ============================================================================
+
+def check_statement(conn, location: str, function: str, sql: str, parameters=None) -> Optional[bool]:
+    """
+    Explain one statement and print it if it fails: True if it passed,
+    False if it can't be explained or fully scans a large table, None if
+    it has no plan to check (DDL, PRAGMA, INSERT ... VALUES).
+    """
+    try:
+        plan = database.explain_query_plan(conn, sql, parameters)
+    except sqlite3.Error as e:
+        print(f"EXPLAIN FAILED  {location}: {e}")
+        print(f"  {' '.join(sql.split())}")
+        return False
+    if not plan:
+        return None
+
+    scans = large_table_scans(sql, plan)
+    if scans and function not in ALLOWED_SCANS:
+        print(f"FULL SCAN  {location}")
+        print(f"  {' '.join(sql.split())}")
+        for detail in plan:
+            print(f"  plan: {detail}")
+        return False
+    return True
+
+
+def check_query_plans(source_db: Optional[Path] = None) -> int:
+    """
+    Explain every statement against a fresh schema, or against a migrated
+    copy of source_db; returns the failure count.
+    """
+    tmp = tempfile.TemporaryDirectory()
+    database.DB_PATH = Path(tmp.name) / "query_plans.db"
+    database.USE_TURSO = False
+    if source_db is not None:
+        shutil.copyfile(source_db, database.DB_PATH)
+    # The same schema steps as app startup
+    database.init_database()
+    database.migrate_database()
+    database.init_comment_search()
+
+    conn = database.get_db_connection()
+    failures = checked = 0
+    dynamic = []
+
+    for module in CHECKED_MODULES:
+        for function, line, sql in iter_statements(BACKEND_DIR / module):
+            if sql is None:
+                dynamic.append((f"{module}:{line}", function))
+                continue
+            result = check_statement(conn, f"{module}:{line} {function}", function, sql)
+            checked += result is not None
+            failures += result is False
+
+    # Statements built at run time, as the samples actually execute them
+    dynamic_functions = {function for _, function in dynamic}
+    sampled = set()
+    for function, sql, parameters in capture_statements(DYNAMIC_SAMPLES):
+        if function not in dynamic_functions:
+            continue
+        sampled.add(function)
+        result = check_statement(conn, f"{function} (sampled)", function, sql, parameters)
+        checked += result is not None
+        failures += result is False
+
+    database.close_connection(conn)
+    tmp.cleanup()
+
+    print(f"\n{checked} statements explained, {failures} failed")
+    unchecked = [f"{location} {function}" for location, function in dynamic if function not in sampled]
+    if unchecked:
+        print(f"{len(unchecked)} statements built at run time have no sample in DYNAMIC_SAMPLES:")
+        for location in unchecked:
+            print(f"  {location}")
+    return failures
+
+
+if __name__ == "__main__":
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    sys.exit(1 if check_query_plans(source) else 0)
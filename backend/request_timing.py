@@ -0,0 +1,128 @@
+"""
+LVS Portal - Request Timing
+Per-request query counts and subsystem timings, reported in a Server-Timing
+header and a JSON access log line
+"""
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import REQUEST_TIMING_HEADER, REQUEST_TIMING_ACCESS_LOG
+
+
+class RequestTiming:
+    """Counters for one request. Spans may overlap (session includes its db time)."""
+
+    __slots__ = ("queries", "connections", "db_seconds", "spans")
+
+    def __init__(self):
+        self.queries = 0
+        self.connections = 0
+        self.db_seconds = 0.0
+        self.spans: Dict[str, float] = {}
+
+    def server_timing(self, total_seconds: float) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        parts = [
+            f"total;dur={total_seconds * 1000:.1f}",
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries, {self.connections} connections"',
+        ]
+        parts.extend(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items())
+        return ", ".join(parts)
+
+
+# Set by RequestTimingMiddleware; None outside a request or when timing is disabled.
+# Thread pool calls (run_in_threadpool, sync endpoints) run in a copy of the
+# request's context, so they update the same RequestTiming.
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def add_query(seconds: float) -> None:
+    """Count one database statement against the current request."""
+    timing = _current.get()
+    if timing is not None:
+        timing.queries += 1
+        timing.db_seconds += seconds
+
+
+def add_connection() -> None:
+    """Count one database connection opened by the current request."""
+    timing = _current.get()
+    if timing is not None:
+        timing.connections += 1
+
+
+def add_span(name: str, seconds: float) -> None:
+    """Add time spent in a subsystem to the current request."""
+    timing = _current.get()
+    if timing is not None:
+        timing.spans[name] = timing.spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block as subsystem `name` of the current request."""
+    if _current.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(name, time.perf_counter() - start)
+
+
+class RequestTimingMiddleware:
+    """
+    Collect a RequestTiming for each request. The Server-Timing header covers
+    work up to the response headers; the access log line, printed when the
+    request finishes, also covers streamed bodies and background tasks.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if REQUEST_TIMING_HEADER:
+                    value = timing.server_timing(time.perf_counter() - start)
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", value.encode("latin-1")),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if REQUEST_TIMING_ACCESS_LOG:
+                route = scope.get("route")
+                print(json.dumps({
+                    "event": "request",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "queries": timing.queries,
+                    "connections": timing.connections,
+                    "db_ms": round(timing.db_seconds * 1000, 2),
+                    "spans_ms": {name: round(s * 1000, 2) for name, s in timing.spans.items()},
+                }))
@@ -0,0 +1,79 @@
+"""
+LVS Portal - JSON Responses
+Fast JSON encoding for API responses
+"""
+import json
+from functools import lru_cache
+from typing import Any, List, Mapping, Optional, Sequence, Type, Union
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+# orjson is optional - fall back to the standard library encoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    print("Warning: orjson not installed. Using standard JSON encoding.")
+
+
+def encode_json(content: Any) -> bytes:
+    """Compact UTF-8 JSON, with orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class for the app: JSONResponse encoded with orjson
+    when it is installed. The output is the same compact UTF-8 JSON.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
+
+
+def json_response(content: Any, headers: Optional[Mapping[str, str]] = None) -> FastJSONResponse:
+    """
+    Return plain data (dicts, lists, strings, numbers) as JSON directly.
+
+    Returning a Response from an endpoint skips FastAPI's jsonable_encoder
+    walk over the whole payload, which dominates for long lists of rows.
+    """
+    return FastJSONResponse(content, headers=headers)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """Cached List[model] serializer."""
+    return TypeAdapter(List[model])
+
+
+class ModelJSONResponse(JSONResponse):
+    """JSONResponse for pydantic models, serialized by pydantic-core."""
+
+    def render(self, content: Union[BaseModel, Sequence[BaseModel]]) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        if not content:
+            return b"[]"
+        return _list_adapter(type(content[0])).dump_json(content)
+
+
+def model_response(
+    content: Union[BaseModel, Sequence[BaseModel]],
+    headers: Optional[Mapping[str, str]] = None
+) -> ModelJSONResponse:
+    """
+    Return already-built pydantic model(s) as JSON directly.
+
+    With a response_model FastAPI would dump the models to dicts, validate
+    them against the model again and then serialize; models we just built
+    are already valid, so this serializes them once. Keep response_model on
+    the route for the OpenAPI schema.
+    """
+    return ModelJSONResponse(content, headers=headers)
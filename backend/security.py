@@ -2,9 +2,11 @@
 LVS Portal - Security Utilities
 Password hashing, JWT tokens, TOTP (Google Authenticator)
 """
+import asyncio
 import secrets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, List
 
 import pyotp
 import qrcode
@@ -20,7 +22,10 @@ from config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     TOTP_ISSUER,
     TOTP_VALID_WINDOW,
+    PASSWORD_HASH_WORKERS,
 )
+from metrics import PASSWORD_HASH_DURATION
+from request_timing import span
 
 # Password hashing context (using Argon2 - more secure than bcrypt)
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
@@ -32,12 +37,29 @@ pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
-    return pwd_context.hash(password)
+    with PASSWORD_HASH_DURATION.labels("hash").time(), span("argon2"):
+        return pwd_context.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with PASSWORD_HASH_DURATION.labels("verify").time(), span("argon2"):
+        return pwd_context.verify(plain_password, hashed_password)
+
+
+# Argon2 runs in C without the GIL, so a small pool hashes in parallel.
+# Kept separate from the default threadpool so bulk imports can't starve
+# request handlers; each hash holds ~64 MB while it runs.
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash many passwords concurrently on the hashing pool, in order."""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_hash_pool, hash_password, password)
+        for password in passwords
+    ))
 
 
 # ============================================================================
@@ -66,7 +88,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 def decode_access_token(token: str) -> Optional[dict]:
     """Decode and validate a JWT access token."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with span("jwt"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None